@@ -10,4 +10,4 @@ python manage.py load_ingredients /app/data/ingredients.json || echo "Failed to
 python manage.py shell -c "from django.contrib.auth import get_user_model; User = get_user_model(); User.objects.filter(username='admin').exists() or User.objects.create_superuser('admin', 'admin@example.com', 'admin')"
 python manage.py create_test_data
 
-exec gunicorn foodgram.wsgi:application --bind 0.0.0.0:8000
\ No newline at end of file
+exec gunicorn -c gunicorn.conf.py
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""
+Async-представления для ASGI-режима (foodgram.urls_async).
+
+DRF не поддерживает async, поэтому горячие эндпоинты написаны обычными
+async-функциями Django поверх async ORM. Ответы повторяют DRF: та же
+аутентификация по токену, те же тела ошибок и тот же JSON-рендерер.
+Методы и форматы, которые представление не обслуживает (OPTIONS,
+browsable API, запись в детальный ресурс), передаются синхронному
+представлению из foodgram.urls.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse
+from django.urls import resolve
+from django.utils.cache import patch_vary_headers
+from rest_framework import exceptions
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+
+from users.authentication import CachedTokenAuthentication
+from . import db_routers
+
+SYNC_URLCONF = 'foodgram.urls'
+
+authentication = CachedTokenAuthentication()
+
+
+def renderer():
+    return api_settings.DEFAULT_RENDERER_CLASSES[0]()
+
+
+def json_response(data, status=200):
+    current = renderer()
+    response = HttpResponse(
+        current.render(data), status=status, content_type=current.media_type
+    )
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+def empty_response(status=204):
+    response = HttpResponse(status=status)
+    del response['Content-Type']
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+def error_response(request, exc):
+    if isinstance(exc.detail, (list, dict)):
+        data = exc.detail
+    else:
+        data = {'detail': exc.detail}
+    response = json_response(data, exc.status_code)
+    if isinstance(
+        exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+    ):
+        response['WWW-Authenticate'] = authentication.authenticate_header(
+            request
+        )
+    return response
+
+
+def wants_browsable_api(request):
+    return (
+        'format' in request.GET
+        or 'text/html' in request.META.get('HTTP_ACCEPT', '')
+    )
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(
+            f'No {queryset.model._meta.object_name} matches the given query.'
+        )
+
+
+async def sync_fallback(request):
+    match = resolve(request.path_info, urlconf=SYNC_URLCONF)
+    return await sync_to_async(match.func)(
+        request, *match.args, **match.kwargs
+    )
+
+
+def api_view(*methods, authenticated=False):
+    """
+    Обертка async-представления: аутентификация, чтение с реплики для
+    безопасных методов и ошибки в формате DRF. Остальные методы уходят
+    в синхронное представление по тому же адресу.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods or wants_browsable_api(request):
+                return await sync_fallback(request)
+            token = None
+            try:
+                credentials = await authentication.aauthenticate(request)
+                request.user = (
+                    credentials[0] if credentials else AnonymousUser()
+                )
+                if authenticated and not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                if (
+                    request.method in SAFE_METHODS
+                    and db_routers.replica_alias() is not None
+                    and not db_routers.is_pinned(request)
+                ):
+                    token = db_routers.read_from_replica()
+                return await view(request, *args, **kwargs)
+            except Http404 as exc:
+                return error_response(request, exceptions.NotFound(*exc.args))
+            except PermissionDenied as exc:
+                return error_response(
+                    request, exceptions.PermissionDenied(*exc.args)
+                )
+            except exceptions.APIException as exc:
+                return error_response(request, exc)
+            finally:
+                if token is not None:
+                    db_routers.reset_reads(token)
+
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
@@ -0,0 +1,82 @@
+import hashlib
+
+from django.utils.cache import (
+    get_conditional_response, patch_vary_headers, quote_etag
+)
+
+
+def make_etag(version, renderer_format):
+    return quote_etag(hashlib.sha256(
+        repr((version, renderer_format)).encode()
+    ).hexdigest()[:32])
+
+
+def is_conditional(request):
+    return 'HTTP_IF_NONE_MATCH' in request.META
+
+
+def not_modified(request, version, renderer_format):
+    """Ответ 304, если версия клиента актуальна, иначе None."""
+    if version is None:
+        return None
+    response = get_conditional_response(
+        request, etag=make_etag(version, renderer_format)
+    )
+    if response is not None:
+        patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def set_validators(response, version, renderer_format):
+    if version is not None:
+        response['ETag'] = make_etag(version, renderer_format)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag для действий чтения из conditional_actions; действие
+    оборачивается в self.conditional(handler, request, ...).
+
+    get_version(obj) возвращает ключ версии или None. На запрос с
+    If-None-Match версия берется одним легким запросом (obj=None), и при
+    совпадении отвечаем 304, не загружая и не сериализуя объект. Для
+    обычного запроса версия считается по уже загруженному объекту, без
+    лишних запросов.
+
+    Last-Modified не отдается: ключ включает флаги текущего пользователя
+    и число записей, которые не меняют updated_at, и ответ по одной дате
+    был бы устаревшим.
+    """
+
+    conditional_actions = ('retrieve',)
+    conditional_object = None
+
+    def get_version(self, obj=None):
+        raise NotImplementedError
+
+    def get_object(self):
+        self.conditional_object = super().get_object()
+        return self.conditional_object
+
+    def conditional(self, handler, request, *args, **kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or self.action not in self.conditional_actions
+        ):
+            return handler(request, *args, **kwargs)
+        renderer_format = request.accepted_renderer.format
+        if is_conditional(request):
+            response = not_modified(
+                request, self.get_version(), renderer_format
+            )
+            if response is not None:
+                return response
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_validators(
+                response, self.get_version(self.conditional_object),
+                renderer_format
+            )
+        return response
@@ -0,0 +1,124 @@
+"""
+Чтение с реплики.
+
+Если в DATABASES есть алиас REPLICA_DATABASE, безопасные запросы к
+вьюсетам с ReplicaReadMixin читают с реплики. Пишем всегда в default.
+После успешного изменяющего запроса клиент на REPLICA_PIN_SECONDS
+закрепляется за основной базой, чтобы сразу видеть свои изменения, пока
+реплика догоняет. Закрепление хранится в подписанной cookie
+REPLICA_PIN_COOKIE, а не в кеше: с локальным кешем следующий запрос
+клиента, попавший в другой процесс, пина бы не увидел.
+"""
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+_read_alias = ContextVar('replica_read_alias', default=None)
+
+
+def replica_alias():
+    alias = settings.REPLICA_DATABASE
+    return alias if alias and alias in settings.DATABASES else None
+
+
+PIN_SALT = 'foodgram.db_routers.pin'
+
+
+def pin(response):
+    response.set_signed_cookie(
+        settings.REPLICA_PIN_COOKIE, '1', salt=PIN_SALT,
+        max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+    )
+
+
+def is_pinned(request):
+    """Подпись проверяется вместе с возрастом: старую cookie не продлить."""
+    return request.get_signed_cookie(
+        settings.REPLICA_PIN_COOKIE, default=None, salt=PIN_SALT,
+        max_age=settings.REPLICA_PIN_SECONDS
+    ) is not None
+
+
+def should_pin(request, response):
+    return (
+        request.method not in SAFE_METHODS
+        and response.status_code < 400
+        and replica_alias() is not None
+    )
+
+
+def read_from_replica():
+    """Включает чтение с реплики до reset_reads(token)."""
+    return _read_alias.set(replica_alias())
+
+
+def reset_reads(token):
+    _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """Отдает реплику для чтения, только пока оно включено для запроса."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db != replica_alias()
+
+
+class ReplicaReadMixin:
+    """
+    Переключает чтение на реплику для GET/HEAD/OPTIONS после
+    аутентификации: свежевыданный токен может еще не доехать до реплики.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            replica_alias() is not None
+            and request.method in SAFE_METHODS
+            and not is_pinned(request)
+        ):
+            read_from_replica()
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            reset_reads(token)
+
+
+class ReadYourWritesMiddleware:
+    """Закрепляет клиента за основной базой после успешной записи."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if should_pin(request, response):
+            pin(response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if should_pin(request, response):
+            pin(response)
+        return response
@@ -0,0 +1,101 @@
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import models
+from django.db.models.fields.files import ImageFieldFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp', 'PNG': 'png'}
+
+
+def derivative_name(name, kind):
+    """
+    Имя производного файла рядом с оригиналом:
+    recipes/abc__thumbnail.jpg.
+    """
+    stem, _ = os.path.splitext(name)
+    image_format = settings.IMAGE_DERIVATIVES[kind]['format']
+    return f'{stem}__{kind}.{EXTENSIONS[image_format]}'
+
+
+def render_derivative(image, size, image_format):
+    image = image.copy()
+    if size:
+        image.thumbnail(size, Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    buffer = io.BytesIO()
+    image.save(
+        buffer, image_format,
+        quality=settings.IMAGE_DERIVATIVE_QUALITY, optimize=True
+    )
+    return buffer.getvalue()
+
+
+def create_derivatives(field_file):
+    storage = field_file.storage
+    try:
+        with storage.open(field_file.name, 'rb') as source:
+            image = ImageOps.exif_transpose(Image.open(source))
+            image.load()
+    except (OSError, UnidentifiedImageError):
+        logger.warning('Не удалось открыть изображение %s', field_file.name)
+        return
+    for kind, options in settings.IMAGE_DERIVATIVES.items():
+        name = derivative_name(field_file.name, kind)
+        content = render_derivative(
+            image, options.get('size'), options['format']
+        )
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(content))
+
+
+class DerivativeImageFieldFile(ImageFieldFile):
+
+    def derivative_url(self, kind):
+        return self.storage.url(derivative_name(self.name, kind))
+
+    def delete(self, save=True):
+        if self.name:
+            for kind in settings.IMAGE_DERIVATIVES:
+                self.storage.delete(derivative_name(self.name, kind))
+        super().delete(save)
+
+
+class DerivativeImageField(models.ImageField):
+    """ImageField, который при загрузке сохраняет уменьшенные копии и WebP."""
+
+    attr_class = DerivativeImageFieldFile
+
+    def pre_save(self, model_instance, add):
+        file = getattr(model_instance, self.attname)
+        uploaded = bool(file) and not file._committed
+        file = super().pre_save(model_instance, add)
+        if uploaded:
+            create_derivatives(file)
+        return file
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Абсолютные ссылки на производные изображения поля source."""
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        variants = {}
+        for kind in settings.IMAGE_DERIVATIVES:
+            url = value.derivative_url(kind)
+            variants[kind] = (
+                request.build_absolute_uri(url) if request else url
+            )
+        return variants
@@ -0,0 +1,340 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.core.signals import request_started
+from django.dispatch import receiver
+from django.http import HttpResponse
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestTimings:
+    """
+    Счетчики одного запроса; подключается как execute_wrapper к БД.
+
+    render -- только рендеринг ответа в байты. Сериализаторы DRF и
+    fast_serializers работают внутри представления и попадают в app.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+        self._render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    def render_started(self):
+        self._render_started = time.perf_counter()
+
+    def render_finished(self, response):
+        self.render += time.perf_counter() - self._render_started
+        return response
+
+    def server_timing(self, total):
+        app = max(total - self.db - self.render, 0)
+        return (
+            f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries", '
+            f'render;dur={self.render * 1000:.2f}, '
+            f'app;dur={app * 1000:.2f}, '
+            f'total;dur={total * 1000:.2f}'
+        )
+
+
+class MetricsRegistry:
+    """
+    Гистограммы по маршрутам в памяти процесса.
+
+    Если задан METRICS_DIR, каждый процесс gunicorn раз в
+    METRICS_FLUSH_INTERVAL секунд сбрасывает свой снимок в файл
+    <METRICS_DIR>/<pid>.json, а эндпоинт метрик суммирует все файлы.
+    Файлы завершившихся процессов удаляются: их счетчики пропадают из
+    сумм, и Prometheus видит это как сброс счетчика.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._flushed_at = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+
+    def observe(self, route, method, status, timings, total):
+        key = f'{method} {route} {status // 100}xx'
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = {
+                    'count': 0,
+                    'duration_sum': 0.0,
+                    'duration_buckets': [0] * len(DURATION_BUCKETS),
+                    'queries_sum': 0,
+                    'queries_buckets': [0] * len(QUERY_BUCKETS),
+                    'db_sum': 0.0,
+                    'render_sum': 0.0,
+                }
+            stats['count'] += 1
+            stats['duration_sum'] += total
+            stats['queries_sum'] += timings.queries
+            stats['db_sum'] += timings.db
+            stats['render_sum'] += timings.render
+            position = bisect.bisect_left(DURATION_BUCKETS, total)
+            if position < len(DURATION_BUCKETS):
+                stats['duration_buckets'][position] += 1
+            position = bisect.bisect_left(QUERY_BUCKETS, timings.queries)
+            if position < len(QUERY_BUCKETS):
+                stats['queries_buckets'][position] += 1
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self._routes))
+
+    def _path(self, directory):
+        return os.path.join(directory, f'{os.getpid()}.json')
+
+    def maybe_flush(self, force=False):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        now = time.monotonic()
+        if (
+            not force
+            and now - self._flushed_at < settings.METRICS_FLUSH_INTERVAL
+        ):
+            return
+        self._flushed_at = now
+        os.makedirs(directory, exist_ok=True)
+        path = self._path(directory)
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(f'{path}.tmp', path)
+
+    def collect(self):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return self.snapshot()
+        self.maybe_flush(force=True)
+        merged = {}
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            if not is_alive(os.path.basename(path)[:-len('.json')]):
+                remove_dump(path)
+                continue
+            try:
+                with open(path) as file:
+                    routes = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for key, stats in routes.items():
+                target = merged.setdefault(key, stats)
+                if target is stats:
+                    continue
+                for name, value in stats.items():
+                    if isinstance(value, list):
+                        target[name] = [
+                            a + b for a, b in zip(target[name], value)
+                        ]
+                    else:
+                        target[name] += value
+        return merged
+
+
+def is_alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ValueError:
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def remove_dump(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+registry = MetricsRegistry()
+
+
+def _cumulative(buckets, counts, total):
+    lines = []
+    running = 0
+    for bound, count in zip(buckets, counts):
+        running += count
+        lines.append((str(bound), running))
+    lines.append(('+Inf', total))
+    return lines
+
+
+def render_prometheus(routes):
+    lines = [
+        '# HELP foodgram_request_duration_seconds Request duration.',
+        '# TYPE foodgram_request_duration_seconds histogram',
+    ]
+    labelled = []
+    for key in sorted(routes):
+        method, route, status = key.split(' ')
+        labels = f'method="{method}",route="{route}",status="{status}"'
+        labelled.append((labels, routes[key]))
+    for labels, stats in labelled:
+        for bound, count in _cumulative(
+            DURATION_BUCKETS, stats['duration_buckets'], stats['count']
+        ):
+            lines.append(
+                f'foodgram_request_duration_seconds_bucket'
+                f'{{{labels},le="{bound}"}} {count}'
+            )
+        lines.append(
+            f'foodgram_request_duration_seconds_sum{{{labels}}} '
+            f'{stats["duration_sum"]:.6f}'
+        )
+        lines.append(
+            f'foodgram_request_duration_seconds_count{{{labels}}} '
+            f'{stats["count"]}'
+        )
+    lines += [
+        '# HELP foodgram_request_db_queries Database queries per request.',
+        '# TYPE foodgram_request_db_queries histogram',
+    ]
+    for labels, stats in labelled:
+        for bound, count in _cumulative(
+            QUERY_BUCKETS, stats['queries_buckets'], stats['count']
+        ):
+            lines.append(
+                f'foodgram_request_db_queries_bucket'
+                f'{{{labels},le="{bound}"}} {count}'
+            )
+        lines.append(
+            f'foodgram_request_db_queries_sum{{{labels}}} '
+            f'{stats["queries_sum"]}'
+        )
+        lines.append(
+            f'foodgram_request_db_queries_count{{{labels}}} {stats["count"]}'
+        )
+    for name, field, help_text in (
+        (
+            'foodgram_request_db_seconds_total', 'db_sum',
+            'Time spent in database queries.'
+        ),
+        (
+            'foodgram_request_render_seconds_total', 'render_sum',
+            'Time spent rendering responses.'
+        ),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for labels, stats in labelled:
+            lines.append(f'{name}{{{labels}}} {stats[field]:.6f}')
+    return '\n'.join(lines) + '\n'
+
+
+_current_timings = ContextVar('request_timings', default=None)
+
+
+def observe_query(execute, sql, params, many, context):
+    """
+    Постоянная обертка соединений: пишет запрос в RequestTimings текущего
+    запроса. Контекст переносится и в поток, где async ORM выполняет SQL,
+    поэтому одновременные ASGI-запросы не смешиваются.
+    """
+    timings = _current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings(execute, sql, params, many, context)
+
+
+@receiver(request_started)
+def install_query_observer(**kwargs):
+    # request_started шлется в том потоке, где пойдут запросы к БД:
+    # в потоке WSGI-воркера или в потоке sync_to_async под ASGI.
+    for connection in connections.all():
+        if observe_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(observe_query)
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеряет запросы: число и время SQL-запросов, время рендеринга
+    ответа и общее время. Отдает их в заголовке Server-Timing и
+    копит гистограммы по маршрутам для /api/metrics/.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+        return self.finish(request, response)
+
+    def start(self, request):
+        request.timings = RequestTimings()
+        return _current_timings.set(request.timings)
+
+    def finish(self, request, response):
+        timings = request.timings
+        total = time.perf_counter() - timings.started
+        response['Server-Timing'] = timings.server_timing(total)
+        match = request.resolver_match
+        registry.observe(
+            match.view_name if match else 'unmatched',
+            request.method, response.status_code, timings, total
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        request.timings.render_started()
+        response.add_post_render_callback(request.timings.render_finished)
+        return response
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(
+            render_prometheus(registry.collect()),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
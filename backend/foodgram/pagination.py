@@ -0,0 +1,64 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.settings import api_settings
+
+
+class KeysetPagination(CursorPagination):
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class LimitOffsetOrCursorPagination(LimitOffsetPagination):
+    """
+    Limit/offset по умолчанию, курсорная пагинация по запросу.
+
+    Курсорный режим включается параметром ?pagination=cursor (или наличием
+    ?cursor=...): страницы строятся по ключу cursor_ordering без COUNT(*)
+    и OFFSET, в ответе только непрозрачные ссылки next/previous.
+    """
+
+    mode_query_param = 'pagination'
+    cursor_ordering = ('-id',)
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.use_cursor(request):
+            self.keyset = None
+            return super().paginate_queryset(queryset, request, view)
+        self.keyset = KeysetPagination()
+        self.keyset.ordering = self.get_cursor_ordering(queryset)
+        if self.default_limit:
+            self.keyset.page_size = self.default_limit
+        return self.keyset.paginate_queryset(queryset, request, view)
+
+    def get_cursor_ordering(self, queryset):
+        return self.cursor_ordering
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePagination(LimitOffsetOrCursorPagination):
+    cursor_ordering = ('-created_at', '-id')
+
+    def get_cursor_ordering(self, queryset):
+        # Подбор по ингредиентам (?have=) и поиск (?search=) листаются в
+        # порядке ранга, как в режиме limit/offset. Фильтр have применяется
+        # после search, поэтому его ранг главнее.
+        annotations = queryset.query.annotations
+        if 'have_rank' in annotations:
+            return ('have_rank',)
+        if 'search_rank' in annotations:
+            return ('-search_rank', '-created_at', '-id')
+        return self.cursor_ordering
+
+
+class FeedPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
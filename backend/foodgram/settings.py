@@ -15,7 +15,8 @@ from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
-FONTS_DIR = os.path.join(BASE_DIR, 'static/fonts')
+FONTS_DIR = os.path.join(BASE_DIR, 'fonts')
+SHOPPING_LIST_FONT = 'DejaVuSans.ttf'
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -46,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.metrics.RequestMetricsMiddleware',
+    'foodgram.db_routers.ReadYourWritesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,7 +60,7 @@ MIDDLEWARE = [
 
 AUTH_USER_MODEL = 'users.CustomUser'
 
-ROOT_URLCONF = 'foodgram.urls'
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', 'foodgram.urls')
 
 TEMPLATES = [
     {
@@ -84,7 +87,7 @@ WSGI_APPLICATION = 'foodgram.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.postgresql'),
-        'NAME': os.getenv('DB_NAME'),
+        'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
@@ -92,6 +95,50 @@ DATABASES = {
     }
 }
 
+# Реплика для чтения: включается заданием DB_REPLICA_HOST (или
+# DB_REPLICA_NAME для локальной проверки на двух файлах SQLite, см.
+# команду sync_sqlite_replica). Остальные параметры берутся у default.
+
+if os.getenv('DB_REPLICA_HOST') or os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': os.getenv('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['foodgram.db_routers.ReplicaRouter']
+REPLICA_DATABASE = 'replica'
+REPLICA_PIN_COOKIE = 'db_pin'
+REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', 5))
+
+
+# Cache
+# При заданном REDIS_URL кеш общий для всех процессов gunicorn.
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Кеш, который видят все процессы: через него рассылаются версии
+# данных, закешированных в памяти процессов. Без Redis его нет (None).
+SHARED_CACHE_ALIAS = 'default' if os.getenv('REDIS_URL') else None
+
+TOKEN_CACHE_ALIAS = SHARED_CACHE_ALIAS
+TOKEN_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -132,6 +179,13 @@ STATIC_ROOT = BASE_DIR / 'static'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+IMAGE_DERIVATIVES = {
+    'thumbnail': {'size': (360, 360), 'format': 'JPEG'},
+    'thumbnail_webp': {'size': (360, 360), 'format': 'WEBP'},
+    'webp': {'size': None, 'format': 'WEBP'},
+}
+IMAGE_DERIVATIVE_QUALITY = 80
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -140,11 +194,20 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'foodgram.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'foodgram.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 6,
 }
@@ -156,4 +219,23 @@ DJOSER = {
         'user': 'users.serializers.CustomUserSerializer',
         'current_user': 'users.serializers.CustomUserSerializer',
     },
-}
\ No newline at end of file
+}
+
+INGREDIENT_SEARCH_LIMIT = 50
+INGREDIENT_INDEX_MAX_AGE = 300
+INGREDIENT_SNAPSHOT_MAX_AGE = 300
+RECIPE_MATCH_LIMIT = 1000
+RECIPE_MATCH_MAX_MISSING = 5
+
+BATCH_MAX_ITEMS = 100
+
+FEED_TIMELINE_THRESHOLD = 1000
+
+SHORT_LINK_CACHE_ALIAS = 'default'
+SHORT_LINK_CACHE_TIMEOUT = 24 * 60 * 60
+SHORT_LINK_NEGATIVE_TIMEOUT = 60
+SHORT_LINK_FLUSH_INTERVAL = 10
+SHORT_LINK_FLUSH_SIZE = 1000
+
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 10
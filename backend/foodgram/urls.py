@@ -21,6 +21,7 @@ from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
 from users.views import CustomUserViewSet
 from recipes.views import RecipeViewSet, IngredientViewSet, short_link_redirect
+from foodgram.metrics import MetricsView
 
 router = DefaultRouter()
 router.register(r'users', CustomUserViewSet, basename='users')
@@ -28,8 +29,9 @@ router.register(r'recipes', RecipeViewSet, basename='recipes')
 router.register(r'ingredients', IngredientViewSet, basename='ingredients')
 
 urlpatterns = [
-    path('s/<int:recipe_id>/', short_link_redirect, name='recipe-short-link'),
+    path('s/<str:code>/', short_link_redirect, name='recipe-short-link'),
     path('admin/', admin.site.urls),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
     path('api/', include(router.urls)),
     path('api/auth/', include('djoser.urls.authtoken')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
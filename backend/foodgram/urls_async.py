@@ -0,0 +1,33 @@
+"""
+URL-ы ASGI-режима: горячие эндпоинты обслуживают async-представления,
+все остальное - как в foodgram.urls. Имена совпадают с маршрутами DRF,
+поэтому reverse() и метрики по маршрутам работают одинаково.
+"""
+from django.urls import path
+
+from recipes import async_views as recipes_views
+from users import async_views as users_views
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path(
+        'api/recipes/<int:pk>/', recipes_views.recipe_detail,
+        name='recipes-detail'
+    ),
+    path(
+        'api/recipes/<int:pk>/favorite/', recipes_views.favorite,
+        name='recipes-favorite'
+    ),
+    path(
+        'api/recipes/<int:pk>/shopping_cart/', recipes_views.shopping_cart,
+        name='recipes-shopping-cart'
+    ),
+    path(
+        'api/ingredients/', recipes_views.ingredient_list,
+        name='ingredients-list'
+    ),
+    path(
+        'api/users/<int:pk>/subscribe/', users_views.subscribe,
+        name='users-subscribe'
+    ),
+] + sync_urlpatterns
@@ -0,0 +1,41 @@
+"""
+Настройки gunicorn.
+
+По умолчанию - sync-воркеры и foodgram.wsgi. GUNICORN_ASGI=1 включает
+ASGI-режим: воркеры uvicorn и foodgram.asgi, где горячие эндпоинты
+(переключатели избранного, корзины и подписки, детальная страница
+рецепта, поиск ингредиентов) обслуживаются async-представлениями.
+Сравнить режимы: manage.py benchmark_api [--asgi] --concurrency N.
+"""
+import multiprocessing
+import os
+
+asgi = os.getenv('GUNICORN_ASGI') == '1'
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+# Async-воркер сам держит много соединений, поэтому воркеров меньше.
+workers = int(os.getenv(
+    'GUNICORN_WORKERS',
+    multiprocessing.cpu_count() + 1 if asgi
+    else multiprocessing.cpu_count() * 2 + 1
+))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+
+if asgi:
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+
+
+def child_exit(server, worker):
+    # Снимок метрик завершившегося воркера (foodgram.metrics) больше не
+    # должен попадать в суммы. Хук выполняется в мастере, где Django не
+    # настроен, поэтому каталог берется из окружения.
+    directory = os.getenv('METRICS_DIR')
+    if directory:
+        try:
+            os.remove(os.path.join(directory, f'{worker.pid}.json'))
+        except FileNotFoundError:
+            pass
@@ -1,4 +1,8 @@
 from django.contrib import admin
+from django.utils import timezone
+from . import search, shopping_list
+from .catalog import recipe_ingredient_index
+from .counters import delete_links
 from .models import Ingredient, Recipe, IngredientInRecipe, Favorite, ShoppingCart
 
 
@@ -12,14 +16,24 @@ class IngredientAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', 'favorite_count')
-    search_fields = ('name', 'author__username')
+    list_display = ('name', 'author', 'favorite_count', 'short_code', 'clicks')
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username', 'short_code')
     list_filter = ('author',)
     empty_value_display = '-пусто-'
 
     def favorite_count(self, obj):
-        return obj.favorited_by.count()
+        return obj.favorites_count
     favorite_count.short_description = 'Добавлено в избранное'
+    favorite_count.admin_order_field = 'favorites_count'
+
+    def delete_model(self, request, obj):
+        shopping_list.recipe_deleted([obj.pk])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        shopping_list.recipe_deleted(queryset.values_list('pk', flat=True))
+        super().delete_queryset(request, queryset)
 
 
 @admin.register(IngredientInRecipe)
@@ -28,6 +42,31 @@ class IngredientInRecipeAdmin(admin.ModelAdmin):
     search_fields = ('recipe__name', 'ingredient__name')
     empty_value_display = '-пусто-'
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self.changed(
+            {obj.recipe_id, form.initial.get('recipe', obj.recipe_id)}
+        )
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.changed([obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        self.changed(recipe_ids)
+
+    def changed(self, recipe_ids):
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            updated_at=timezone.now()
+        )
+        search.update_index(recipe_ids)
+        recipe_ingredient_index.refresh_on_commit(recipe_ids)
+        shopping_list.rebuild(ShoppingCart.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('user_id', flat=True))
+
 
 @admin.register(Favorite)
 class FavoriteAdmin(admin.ModelAdmin):
@@ -35,9 +74,29 @@ class FavoriteAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'recipe__name')
     empty_value_display = '-пусто-'
 
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Favorite.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_links(queryset, 'recipe', 'favorites_count')
+
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
-    empty_value_display = '-пусто-'
\ No newline at end of file
+    empty_value_display = '-пусто-'
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        shopping_list.rebuild(
+            {obj.user_id, form.initial.get('user', obj.user_id)}
+        )
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, ShoppingCart.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
+        delete_links(queryset, 'recipe', 'shopping_cart_count')
+        shopping_list.rebuild(user_ids)
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Async-версии самых нагруженных эндпоинтов рецептов для ASGI-режима.
+Ответы совпадают с RecipeViewSet и IngredientViewSet.
+"""
+from asgiref.sync import sync_to_async
+
+from foodgram.async_api import (
+    aget_object_or_404, api_view, empty_response, json_response, renderer
+)
+from foodgram.conditional import is_conditional, not_modified, set_validators
+from . import shopping_list
+from .catalog import ingredient_index
+from .counters import adelete_links
+from .models import Favorite, Recipe, ShoppingCart
+from .serializers import RecipeMinifiedSerializer, RecipeSerializer
+from .views import recipe_version, recipe_versions
+
+
+@api_view('GET', 'HEAD')
+async def recipe_detail(request, pk):
+    renderer_format = renderer().format
+    if is_conditional(request):
+        response = not_modified(
+            request,
+            await recipe_versions(pk, request.user).afirst(),
+            renderer_format
+        )
+        if response is not None:
+            return response
+    recipe = await aget_object_or_404(
+        Recipe.objects.with_related().with_user_flags(request.user), pk=pk
+    )
+    response = json_response(
+        RecipeSerializer(recipe, context={'request': request}).data
+    )
+    return set_validators(response, recipe_version(recipe), renderer_format)
+
+
+async def toggle(request, pk, model, exists_error, missing_error, add, remove):
+    recipe = await aget_object_or_404(Recipe.objects.all(), pk=pk)
+    exists = await model.objects.filter(
+        user=request.user, recipe=recipe
+    ).aexists()
+    if request.method == 'POST':
+        if exists:
+            return json_response({'errors': exists_error}, 400)
+        await add(request.user, recipe)
+        return json_response(RecipeMinifiedSerializer(recipe).data, 201)
+    if not exists:
+        return json_response({'errors': missing_error}, 400)
+    await remove(request.user, recipe)
+    return empty_response()
+
+
+async def add_favorite(user, recipe):
+    await Favorite.objects.acreate(user=user, recipe=recipe)
+
+
+async def remove_favorite(user, recipe):
+    await adelete_links(
+        Favorite.objects.filter(user=user, recipe=recipe),
+        'recipe', 'favorites_count'
+    )
+
+
+@api_view('POST', 'DELETE', authenticated=True)
+async def favorite(request, pk):
+    return await toggle(
+        request, pk, Favorite,
+        'Рецепт уже в избранном', 'Рецепт не в избранном',
+        add_favorite, remove_favorite
+    )
+
+
+@api_view('POST', 'DELETE', authenticated=True)
+async def shopping_cart(request, pk):
+    # Корзина и список покупок меняются в одной транзакции, а async
+    # транзакций в Django нет: этот шаг выполняется синхронно.
+    return await toggle(
+        request, pk, ShoppingCart,
+        'Рецепт уже в списке покупок', 'Рецепт не в списке покупок',
+        sync_to_async(shopping_list.add_to_cart),
+        sync_to_async(shopping_list.remove_from_cart)
+    )
+
+
+@api_view('GET', 'HEAD')
+async def ingredient_list(request):
+    await ingredient_index.aload()
+    name = request.GET.get('name')
+    version = (*ingredient_index.version(), name)
+    renderer_format = renderer().format
+    if is_conditional(request):
+        response = not_modified(request, version, renderer_format)
+        if response is not None:
+            return response
+    items = ingredient_index.search(name) if name else ingredient_index.all()
+    return set_validators(json_response(items), version, renderer_format)
@@ -0,0 +1,69 @@
+"""
+Пакетные операции над связями пользователя: избранным, корзиной и
+подписками. Связи создаются одним bulk_create без сигналов, поэтому
+счетчики созданных обновляет вызывающий код; удаление идет через
+counters.delete_links.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from .counters import delete_links
+
+
+class BatchSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_ITEMS
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
+def result(target_id, code, errors=None):
+    item = {'id': target_id, 'status': code}
+    if errors:
+        item['errors'] = errors
+    return item
+
+
+def linked(user, model, field, target_ids):
+    return set(model.objects.select_for_update().filter(
+        user=user, **{f'{field}__in': target_ids}
+    ).values_list(f'{field}_id', flat=True))
+
+
+def link(user, model, field, target_ids):
+    """
+    Связывает user с target_ids; возвращает id, связи с которыми создал
+    именно этот вызов. Если параллельный запрос успел создать часть
+    связей, вставка откатывается и повторяется без них.
+    """
+    while True:
+        existing = linked(user, model, field, target_ids)
+        created = [
+            target_id for target_id in target_ids
+            if target_id not in existing
+        ]
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    model(user=user, **{f'{field}_id': target_id})
+                    for target_id in created
+                )
+        except IntegrityError:
+            continue
+        return set(created)
+
+
+def unlink(user, model, field, counter, target_ids):
+    """
+    Удаляет связи user с target_ids и уменьшает counter у целей;
+    возвращает id, связи с которыми удалены.
+    """
+    return set(delete_links(
+        model.objects.filter(user=user, **{f'{field}__in': target_ids}),
+        field, counter
+    ))
@@ -0,0 +1,353 @@
+import bisect
+import gzip
+import hashlib
+import json
+import threading
+import time
+from array import array
+from collections import Counter
+
+import brotli
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+
+from .models import Ingredient, IngredientInRecipe
+
+
+# По убыванию компактности: при равном q выбирается более раннее.
+ENCODINGS = ('br', 'gzip')
+
+
+def accepted_encodings(header):
+    """Кодирования из заголовка Accept-Encoding с их весами q."""
+    weights = {}
+    for part in header.split(','):
+        coding, *params = part.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    return weights
+
+
+class CatalogSnapshot:
+    """Весь каталог, отрендеренный в JSON и сжатый заранее."""
+
+    def __init__(self, items):
+        self.items = items
+        raw = json.dumps(
+            items, ensure_ascii=False, separators=(',', ':')
+        ).encode()
+        self.version = hashlib.sha256(raw).hexdigest()[:32]
+        self.bodies = {
+            'br': brotli.compress(raw, quality=11),
+            'gzip': gzip.compress(raw, compresslevel=9, mtime=0),
+            None: raw,
+        }
+
+    def negotiate(self, accept_encoding):
+        """
+        Кодирование с наибольшим q (при равенстве - самое компактное);
+        None, если сжатие не принимается (q=0) или identity явно
+        предпочтительнее.
+        """
+        weights = accepted_encodings(accept_encoding)
+        best, best_weight = None, 0
+        for encoding in ENCODINGS:
+            weight = weights.get(encoding, weights.get('*', 0))
+            if weight > best_weight:
+                best, best_weight = encoding, weight
+        if weights.get('identity', 0) > best_weight:
+            return None
+        return best
+
+
+CATALOG_VERSION_KEY = 'recipes:ingredient-catalog-version'
+
+
+def shared_cache():
+    alias = settings.SHARED_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+class IngredientIndex:
+    """
+    Отсортированный индекс названий ингредиентов в памяти процесса.
+
+    Строится лениво при первом обращении и сбрасывается сигналами при
+    изменении Ingredient. Сброс публикует новую версию каталога в общем
+    кеше (SHARED_CACHE_ALIAS), и остальные процессы перестраивают индекс
+    при следующем обращении. Без общего кеша изменения из других
+    процессов подхватываются не позже чем через INGREDIENT_INDEX_MAX_AGE
+    секунд.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = None
+        self._items = None
+        self._version = None
+        self._snapshot = None
+        self._built_at = 0
+        self._published = None
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+            self._items = None
+            self._snapshot = None
+        if shared_cache() is not None:
+            transaction.on_commit(self.publish)
+
+    def publish(self):
+        """Новая версия каталога для всех процессов."""
+        cache = shared_cache()
+        cache.add(CATALOG_VERSION_KEY, 0, None)
+        try:
+            cache.incr(CATALOG_VERSION_KEY)
+        except ValueError:
+            cache.set(CATALOG_VERSION_KEY, 1, None)
+
+    def published(self):
+        cache = shared_cache()
+        return None if cache is None else cache.get(CATALOG_VERSION_KEY)
+
+    async def apublished(self):
+        cache = shared_cache()
+        return (
+            None if cache is None else await cache.aget(CATALOG_VERSION_KEY)
+        )
+
+    def _is_stale(self, published):
+        if published != self._published:
+            return True
+        max_age = getattr(settings, 'INGREDIENT_INDEX_MAX_AGE', None)
+        return bool(max_age) and time.monotonic() - self._built_at > max_age
+
+    def _rows(self):
+        return Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit', 'updated_at'
+        )
+
+    def _build(self, rows, published):
+        self._published = published
+        self._version = (
+            max((row[3] for row in rows), default=None), len(rows)
+        )
+        rows = sorted(
+            (name.casefold(), pk, name, unit) for pk, name, unit, _ in rows
+        )
+        self._keys = [row[0] for row in rows]
+        self._items = [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for _, pk, name, unit in rows
+        ]
+        self._built_at = time.monotonic()
+
+    def _load(self):
+        keys, items = self._keys, self._items
+        published = self.published()
+        if keys is not None and not self._is_stale(published):
+            return keys, items
+        with self._lock:
+            if self._keys is None or self._is_stale(published):
+                self._build(list(self._rows()), published)
+            return self._keys, self._items
+
+    async def aload(self):
+        """Строит индекс через async ORM; дальше чтение идет из памяти."""
+        published = await self.apublished()
+        if self._keys is not None and not self._is_stale(published):
+            return
+        rows = [row async for row in self._rows()]
+        with self._lock:
+            if self._keys is None or self._is_stale(published):
+                self._build(rows, published)
+
+    def all(self):
+        return self._load()[1]
+
+    def snapshot(self):
+        """Снимок каталога; пересобирается вместе с индексом."""
+        items = self.all()
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.items is not items:
+            snapshot = CatalogSnapshot(items)
+            with self._lock:
+                if self._items is items:
+                    self._snapshot = snapshot
+        return snapshot
+
+    def version(self):
+        """(время последнего изменения, число ингредиентов) для ETag."""
+        self._load()
+        return self._version
+
+    def search(self, query, limit=None):
+        """Сначала совпадения по началу названия, затем по подстроке."""
+        if limit is None:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        keys, items = self._load()
+        query = query.casefold()
+        start = bisect.bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        result = items[start:min(end, start + limit)]
+        if len(result) < limit:
+            for position, key in enumerate(keys):
+                if query in key and not start <= position < end:
+                    result.append(items[position])
+                    if len(result) == limit:
+                        break
+        return result
+
+
+ingredient_index = IngredientIndex()
+
+
+class RecipeIngredientIndex:
+    """
+    Инвертированный индекс ингредиент -> рецепты в памяти процесса.
+
+    Списки рецептов и составы рецептов хранятся в array('l'). Записи
+    текущего процесса применяются точечно после коммита транзакции,
+    изменения из других процессов подхватываются полной перестройкой
+    не позже чем через INGREDIENT_INDEX_MAX_AGE секунд. Перестройка идет
+    в фоновом потоке, запросы тем временем обслуживает прежний индекс.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = None
+        self._recipes = None
+        self._built_at = 0
+        self._generation = 0
+        # Рецепты, обновленные во время фоновой перестройки, или None.
+        self._rebuilding = None
+
+    def invalidate(self):
+        with self._lock:
+            self._postings = None
+            self._recipes = None
+            self._generation += 1
+
+    def _is_stale(self):
+        max_age = getattr(settings, 'INGREDIENT_INDEX_MAX_AGE', None)
+        return bool(max_age) and time.monotonic() - self._built_at > max_age
+
+    def _build(self):
+        postings, recipes = {}, {}
+        rows = IngredientInRecipe.objects.order_by('recipe_id').values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator(chunk_size=10000)
+        for recipe_id, ingredient_id in rows:
+            recipes.setdefault(recipe_id, array('l')).append(ingredient_id)
+            postings.setdefault(ingredient_id, array('l')).append(recipe_id)
+        return postings, recipes
+
+    def _load(self):
+        postings, recipes = self._postings, self._recipes
+        if postings is not None:
+            if self._is_stale():
+                self._start_rebuild()
+            return postings, recipes
+        with self._lock:
+            if self._postings is None:
+                self._postings, self._recipes = self._build()
+                self._built_at = time.monotonic()
+            return self._postings, self._recipes
+
+    def _start_rebuild(self):
+        with self._lock:
+            if self._rebuilding is not None or not self._is_stale():
+                return
+            self._rebuilding = set()
+            generation = self._generation
+        threading.Thread(
+            target=self._rebuild_in_thread, args=(generation,), daemon=True
+        ).start()
+
+    def _rebuild_in_thread(self, generation):
+        try:
+            self._rebuild(generation)
+        finally:
+            connection.close()
+
+    def _rebuild(self, generation):
+        try:
+            postings, recipes = self._build()
+        except Exception:
+            with self._lock:
+                self._rebuilding = None
+            raise
+        with self._lock:
+            updated, self._rebuilding = self._rebuilding, None
+            if generation != self._generation:
+                return
+            self._postings, self._recipes = postings, recipes
+            self._built_at = time.monotonic()
+        # Новый индекс мог прочитать эти рецепты до их изменения.
+        self.refresh(updated)
+
+    def refresh(self, recipe_ids):
+        """Перечитывает составы рецептов; удаленные рецепты выпадают."""
+        recipe_ids = set(recipe_ids)
+        if self._postings is None or not recipe_ids:
+            return
+        current = {}
+        for recipe_id, ingredient_id in IngredientInRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_id'):
+            current.setdefault(recipe_id, array('l')).append(ingredient_id)
+        with self._lock:
+            if self._rebuilding is not None:
+                self._rebuilding.update(recipe_ids)
+            if self._postings is None:
+                return
+            for recipe_id in recipe_ids:
+                for ingredient_id in self._recipes.pop(recipe_id, ()):
+                    self._postings[ingredient_id].remove(recipe_id)
+                ingredient_ids = current.get(recipe_id)
+                if ingredient_ids:
+                    self._recipes[recipe_id] = ingredient_ids
+                    for ingredient_id in ingredient_ids:
+                        self._postings.setdefault(
+                            ingredient_id, array('l')
+                        ).append(recipe_id)
+
+    def refresh_on_commit(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        transaction.on_commit(lambda: self.refresh(recipe_ids))
+
+    def match(self, ingredient_ids, missing=0, limit=None):
+        """
+        id рецептов, которым не хватает не больше missing ингредиентов
+        из ingredient_ids: сначала с меньшим числом недостающих, затем с
+        большей долей имеющихся, затем более новые.
+        """
+        if limit is None:
+            limit = settings.RECIPE_MATCH_LIMIT
+        postings, recipes = self._load()
+        hits = Counter()
+        for ingredient_id in set(ingredient_ids):
+            hits.update(postings.get(ingredient_id, ()))
+        ranked = []
+        for recipe_id, count in hits.items():
+            total = len(recipes.get(recipe_id, ()))
+            if count <= total and total - count <= missing:
+                ranked.append((total - count, -count / total, -recipe_id))
+        ranked.sort()
+        return [-recipe_id for _, _, recipe_id in ranked[:limit]]
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
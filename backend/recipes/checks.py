@@ -0,0 +1,19 @@
+import os
+
+from django.core.checks import Error, register
+
+from .exports import pdf_font_path
+
+
+@register()
+def shopping_list_font_check(app_configs, **kwargs):
+    """Без TTF с кириллицей PDF списка покупок не построить."""
+    path = pdf_font_path()
+    if os.path.exists(path):
+        return []
+    return [Error(
+        f'Не найден шрифт для PDF списка покупок: {path}',
+        hint='Положите TTF с кириллицей в FONTS_DIR или поменяйте '
+             'SHOPPING_LIST_FONT.',
+        id='recipes.E001',
+    )]
@@ -0,0 +1,96 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField()
+        ),
+        Value(0)
+    )
+
+
+def recount(recipe_model, user_model, favorite_model, cart_model,
+            follow_model):
+    """Пересчитывает все счетчики одним UPDATE на таблицу."""
+    recipe_model.objects.update(
+        favorites_count=count_of(favorite_model, 'recipe'),
+        shopping_cart_count=count_of(cart_model, 'recipe'),
+    )
+    user_model.objects.update(
+        recipes_count=count_of(recipe_model, 'author'),
+        followers_count=count_of(follow_model, 'author'),
+    )
+
+
+def increment(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def decrement_many(queryset, field, target_ids):
+    """
+    Уменьшает field у записей target_ids на число их вхождений: один
+    UPDATE на каждую величину уменьшения.
+    """
+    by_amount = defaultdict(list)
+    for target_id, amount in Counter(target_ids).items():
+        by_amount[amount].append(target_id)
+    for amount, ids in by_amount.items():
+        increment(queryset.filter(pk__in=ids), field, -amount)
+
+
+def delete_links(queryset, target, counter):
+    """
+    Удаляет связи (избранное, корзину, подписки) и уменьшает counter у
+    записей, на которые они ссылаются полем target. На связях нет
+    сигналов post_delete: они отключили бы быстрое каскадное удаление.
+    Каскады при удалении рецепта или пользователя учитывают приемники
+    pre_delete в recipes.signals и users.signals. Возвращает id целей
+    удаленных связей.
+    """
+    model = queryset.model._meta.get_field(target).related_model
+    with transaction.atomic(using=queryset.db):
+        rows = list(queryset.select_for_update().values_list(
+            'pk', f'{target}_id'
+        ))
+        if rows:
+            queryset.model.objects.filter(
+                pk__in=[pk for pk, _ in rows]
+            ).delete()
+            decrement_many(
+                model.objects.all(), counter,
+                [target_id for _, target_id in rows]
+            )
+    return [target_id for _, target_id in rows]
+
+
+async def aincrement(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return await queryset.aupdate(**{field: F(field) + delta})
+
+
+async def adelete_links(queryset, target, counter):
+    """
+    Async-вариант delete_links для ASGI-режима. Async-транзакций в Django
+    нет, поэтому вместо блокировки строк каждая связь удаляется отдельным
+    DELETE, и counter уменьшается, только если строку удалил этот запрос:
+    параллельное удаление той же связи не вычтет ее дважды.
+    """
+    model = queryset.model._meta.get_field(target).related_model
+    removed = []
+    async for pk, target_id in queryset.values_list('pk', f'{target}_id'):
+        deleted, _ = await queryset.model.objects.filter(pk=pk).adelete()
+        if deleted:
+            await aincrement(model.objects.filter(pk=target_id), counter, -1)
+            removed.append(target_id)
+    return removed
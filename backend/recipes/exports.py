@@ -0,0 +1,92 @@
+import csv
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from .models import ShoppingListItem
+
+TITLE = 'Список покупок'
+CHUNK_SIZE = 2000
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_SPOOL_SIZE = 1024 * 1024
+
+
+def shopping_list_rows(user):
+    """Итератор по суммарным количествам ингредиентов из корзины."""
+    return ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+    ).order_by('ingredient__name').iterator(chunk_size=CHUNK_SIZE)
+
+
+def render_txt(rows):
+    yield f'{TITLE}\n\n'.encode()
+    for name, unit, amount in rows:
+        yield f'{name} - {amount} {unit}\n'.encode()
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(['Ингредиент', 'Количество', 'Единица']).encode()
+    for name, unit, amount in rows:
+        yield writer.writerow([name, amount, unit]).encode()
+
+
+def pdf_font_path():
+    return os.path.join(settings.FONTS_DIR, settings.SHOPPING_LIST_FONT)
+
+
+def _pdf_font():
+    # Встроенные шрифты PDF не содержат кириллицы: без TTF названия
+    # ингредиентов превратились бы в квадраты, поэтому запасного нет.
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        path = pdf_font_path()
+        if not os.path.exists(path):
+            raise ImproperlyConfigured(
+                f'Не найден шрифт для PDF списка покупок: {path}'
+            )
+        pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, path))
+    return PDF_FONT_NAME
+
+
+def render_pdf(rows):
+    # PDF нельзя отдавать по мере генерации: reportlab пишет документ
+    # целиком при save(). Поэтому он собирается во временный файл, который
+    # держится в памяти только до PDF_SPOOL_SIZE, и отдаётся кусками.
+    font = _pdf_font()
+    width, height = A4
+    margin = 50
+    with tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_SIZE) as buffer:
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        pdf.setFont(font, 16)
+        pdf.drawString(margin, height - margin, TITLE)
+        pdf.setFont(font, 12)
+        y = height - margin - 30
+        for name, unit, amount in rows:
+            if y < margin:
+                pdf.showPage()
+                pdf.setFont(font, 12)
+                y = height - margin
+            pdf.drawString(margin, y, f'{name} - {amount} {unit}')
+            y -= 18
+        pdf.save()
+        buffer.seek(0)
+        while chunk := buffer.read(64 * 1024):
+            yield chunk
+
+
+EXPORT_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', render_txt),
+    'csv': ('text/csv; charset=utf-8', render_csv),
+    'pdf': ('application/pdf', render_pdf),
+}
@@ -0,0 +1,109 @@
+"""
+Быстрый путь чтения списка рецептов.
+
+Строит тот же JSON, что RecipeSerializer, но из строк .values() без
+экземпляров моделей и полей DRF: рецепты с автором берутся одним
+запросом, ингредиенты страницы - вторым. Соответствие RecipeSerializer
+байт в байт проверяет FastSerializersContractTest; при изменении полей
+RecipeSerializer, CustomUserSerializer или IngredientAmountSerializer
+этот модуль меняется вместе с ними.
+"""
+from django.conf import settings
+
+from foodgram.images import derivative_name
+from users.models import CustomUser
+from .models import IngredientInRecipe, Recipe
+
+RECIPE_VALUES = (
+    'id', 'created_at', 'name', 'text', 'cooking_time', 'image',
+    'author_id', 'author__email', 'author__username', 'author__first_name',
+    'author__last_name', 'author__avatar', 'is_favorited',
+    'is_in_shopping_cart', 'author_is_subscribed',
+)
+
+INGREDIENT_VALUES = (
+    'recipe_id', 'ingredient_id', 'ingredient__name',
+    'ingredient__measurement_unit', 'amount',
+)
+
+
+def recipe_rows(queryset):
+    """Queryset из with_user_flags() -> строки для recipes()."""
+    fields = RECIPE_VALUES
+    # Ранги подбора по ингредиентам и поиска нужны курсору RecipePagination.
+    fields += tuple(
+        rank for rank in ('have_rank', 'search_rank')
+        if rank in queryset.query.annotations
+    )
+    return queryset.prefetch_related(None).values(*fields)
+
+
+def image_mapper(storage, request):
+    """
+    (url, варианты) по имени файла, как ImageField и ImageVariantsField:
+    абсолютные ссылки при наличии request, None для пустого поля.
+    """
+    absolute = request.build_absolute_uri if request else str
+    kinds = tuple(settings.IMAGE_DERIVATIVES)
+
+    def image(name):
+        if not name:
+            return None, None
+        return absolute(storage.url(name)), {
+            kind: absolute(storage.url(derivative_name(name, kind)))
+            for kind in kinds
+        }
+
+    return image
+
+
+def ingredients_by_recipe(recipe_ids):
+    ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, pk, name, unit, amount in IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list(*INGREDIENT_VALUES):
+        ingredients[recipe_id].append({
+            'id': pk,
+            'name': name,
+            'measurement_unit': unit,
+            'amount': amount,
+        })
+    return ingredients
+
+
+def recipes(rows, request=None):
+    """Данные страницы рецептов в форме RecipeSerializer(many=True)."""
+    rows = list(rows)
+    recipe_image = image_mapper(
+        Recipe._meta.get_field('image').storage, request
+    )
+    avatar_image = image_mapper(
+        CustomUser._meta.get_field('avatar').storage, request
+    )
+    ingredients = ingredients_by_recipe([row['id'] for row in rows])
+    data = []
+    for row in rows:
+        image, image_variants = recipe_image(row['image'])
+        avatar, avatar_variants = avatar_image(row['author__avatar'])
+        data.append({
+            'id': row['id'],
+            'author': {
+                'email': row['author__email'],
+                'id': row['author_id'],
+                'username': row['author__username'],
+                'first_name': row['author__first_name'],
+                'last_name': row['author__last_name'],
+                'avatar': avatar,
+                'avatar_variants': avatar_variants,
+                'is_subscribed': row['author_is_subscribed'],
+            },
+            'name': row['name'],
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+            'image': image,
+            'image_variants': image_variants,
+            'ingredients': ingredients[row['id']],
+            'is_favorited': row['is_favorited'],
+            'is_in_shopping_cart': row['is_in_shopping_cart'],
+        })
+    return data
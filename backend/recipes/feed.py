@@ -0,0 +1,99 @@
+"""
+Лента рецептов авторов, на которых подписан пользователь.
+
+Обычно лента строится запросом по подпискам с индексом
+(author, created_at, id). Для пользователей с FEED_TIMELINE_THRESHOLD
+и более подписок команда build_timelines заводит Timeline и заранее
+раскладывает рецепты в TimelineEntry; дальше таблица поддерживается при
+публикации рецептов и изменении подписок. У Follow нет сигналов
+post_delete, чтобы подписки удалялись каскадом одним запросом, поэтому
+отписку учитывает вызывающий код (unfollowed).
+"""
+from django.db import connection
+from django.db.models import Q
+
+from users.models import Follow
+from .models import Recipe, Timeline, TimelineEntry
+
+FILL_SQL = (
+    'INSERT INTO recipes_timelineentry (user_id, recipe_id, created_at) '
+    'SELECT f.user_id, r.id, r.created_at FROM users_follow f '
+    'JOIN recipes_recipe r ON r.author_id = f.author_id '
+    'WHERE f.user_id = %s'
+)
+
+
+def fan_in(recipes, user):
+    return recipes.filter(
+        author__in=Follow.objects.filter(user=user).values('author')
+    )
+
+
+def has_timeline(user_id):
+    return Timeline.objects.filter(user_id=user_id).exists()
+
+
+def timeline_entries(user):
+    return TimelineEntry.objects.filter(user=user)
+
+
+def build_timeline(user_id):
+    """Заводит или перестраивает ленту пользователя целиком."""
+    Timeline.objects.update_or_create(user_id=user_id)
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    with connection.cursor() as cursor:
+        cursor.execute(FILL_SQL, [user_id])
+
+
+def drop_timeline(user_id):
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    Timeline.objects.filter(user_id=user_id).delete()
+
+
+def recipe_published(recipe):
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id, recipe=recipe, created_at=recipe.created_at
+            )
+            for user_id in Follow.objects.filter(
+                author_id=recipe.author_id, user__timeline__isnull=False
+            ).values_list('user_id', flat=True)
+        ],
+        ignore_conflicts=True
+    )
+
+
+def followed(user_id, author_ids):
+    if not author_ids or not has_timeline(user_id):
+        return
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, recipe_id=pk, created_at=created_at)
+            for pk, created_at in Recipe.objects.filter(
+                author_id__in=author_ids
+            ).values_list('id', 'created_at').iterator()
+        ],
+        ignore_conflicts=True
+    )
+
+
+def user_deleted(user_id):
+    """Записи лент пользователя и записи с его рецептами в чужих лентах."""
+    TimelineEntry.objects.filter(
+        Q(user_id=user_id) | Q(recipe__author_id=user_id)
+    ).delete()
+
+
+def unfollowed(user_id, author_ids):
+    if author_ids:
+        TimelineEntry.objects.filter(
+            user_id=user_id, recipe__author_id__in=author_ids
+        ).delete()
+
+
+async def aunfollowed(user_id, author_ids):
+    if author_ids:
+        await TimelineEntry.objects.filter(
+            user_id=user_id, recipe__author_id__in=author_ids
+        ).adelete()
@@ -1,26 +1,59 @@
+from django.conf import settings
+from django.db.models import Case, IntegerField, Value, When
 from django_filters import rest_framework as filters
+from . import search
+from .catalog import recipe_ingredient_index
 from .models import Recipe, Ingredient
 
 
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
 class RecipeFilter(filters.FilterSet):
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(method='filter_is_in_shopping_cart')
     author = filters.NumberFilter(field_name='author__id')
+    search = filters.CharFilter(method='filter_search')
+    have = NumberInFilter(method='filter_have')
+    missing = filters.NumberFilter(method='filter_missing', min_value=0)
 
     class Meta:
         model = Recipe
-        fields = ['is_favorited', 'is_in_shopping_cart', 'author']
+        fields = [
+            'is_favorited', 'is_in_shopping_cart', 'author', 'search',
+            'have', 'missing'
+        ]
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            print(f"Favorited filter: user={self.request.user}, value={value}")  # Отладка
             return queryset.filter(favorites__user=self.request.user)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            print(f"Shopping cart filter: user={self.request.user}, value={value}")  # Отладка
-            filtered_qs = queryset.filter(in_shopping_cart__user=self.request.user)
-            print(f"Filtered recipes: {[r.id for r in filtered_qs]}")  # Отладка
-            return filtered_qs
-        return queryset
\ No newline at end of file
+            return queryset.filter(in_shopping_cart__user=self.request.user)
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search.search(queryset, value)
+
+    def filter_have(self, queryset, name, value):
+        missing = min(
+            int(self.form.cleaned_data.get('missing') or 0),
+            settings.RECIPE_MATCH_MAX_MISSING
+        )
+        recipe_ids = recipe_ingredient_index.match(
+            [int(ingredient_id) for ingredient_id in value], missing
+        )
+        return queryset.filter(id__in=recipe_ids).annotate(
+            have_rank=Case(
+                *(When(id=recipe_id, then=Value(position))
+                  for position, recipe_id in enumerate(recipe_ids)),
+                default=Value(len(recipe_ids)),
+                output_field=IntegerField()
+            )
+        ).order_by('have_rank')
+
+    def filter_missing(self, queryset, name, value):
+        return queryset
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from rest_framework.authtoken.models import Token
+from foodgram.metrics import install_query_observer
+from recipes.models import Recipe
+
+User = get_user_model()
+
+ENDPOINTS = {
+    'recipes_list': '/api/recipes/',
+    'recipes_list_cursor': '/api/recipes/?pagination=cursor',
+    'recipe_detail': '/api/recipes/{recipe_id}/',
+    'users_list': '/api/users/',
+    'user_me': '/api/users/me/',
+    'subscriptions': '/api/users/subscriptions/?recipes_limit=3',
+    'feed': '/api/recipes/feed/',
+    'ingredients': '/api/ingredients/',
+    'ingredients_search': '/api/ingredients/?name=са',
+    'ingredients_snapshot': '/api/ingredients/snapshot/',
+    'download_shopping_cart': '/api/recipes/download_shopping_cart/',
+    'favorite_toggle': '/api/recipes/{free_recipe_id}/favorite/',
+    'shopping_cart_toggle': '/api/recipes/{free_recipe_id}/shopping_cart/',
+    'subscribe_toggle': (
+        '/api/users/{free_author_id}/subscribe/?recipes_limit=3'
+    ),
+}
+
+# Переключатели замеряются парами POST + DELETE, чтобы данные не менялись.
+TOGGLES = {'favorite_toggle', 'shopping_cart_toggle', 'subscribe_toggle'}
+
+ASGI_URLCONF = 'foodgram.urls_async'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def sample(response, elapsed):
+    timings = response.request_timings
+    return elapsed, timings.queries, timings.db, response.status_code
+
+
+class WsgiRunner:
+    """Запросы через WSGI-обработчик; параллельные - в потоках."""
+
+    def __init__(self, token, concurrency):
+        self.clients = [
+            Client(HTTP_AUTHORIZATION=f'Token {token}')
+            for _ in range(concurrency)
+        ]
+        self.pool = (
+            ThreadPoolExecutor(concurrency) if concurrency > 1 else None
+        )
+
+    def request(self, client, method, path):
+        started = time.perf_counter()
+        response = getattr(client, method)(path)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        response.close()
+        response.request_timings = response.wsgi_request.timings
+        return sample(response, time.perf_counter() - started)
+
+    def round(self, method, paths):
+        if self.pool is None:
+            return [self.request(self.clients[0], method, paths[0])]
+        return list(self.pool.map(
+            self.request, self.clients, [method] * len(paths), paths
+        ))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+class AsgiRunner:
+    """
+    Запросы через ASGI-обработчик с async-представлениями из
+    foodgram.urls_async; параллельные - конкурентными задачами в цикле.
+    """
+
+    def __init__(self, token, concurrency):
+        self.clients = [AsyncClient() for _ in range(concurrency)]
+        self.headers = {'Authorization': f'Token {token}'}
+        self.urlconf = override_settings(ROOT_URLCONF=ASGI_URLCONF)
+        self.urlconf.enable()
+
+    async def request(self, client, method, path):
+        started = time.perf_counter()
+        response = await getattr(client, method)(path, headers=self.headers)
+        if response.streaming:
+            async for _ in response:
+                pass
+        response.request_timings = response.asgi_request.timings
+        return sample(response, time.perf_counter() - started)
+
+    async def gather(self, method, paths):
+        return await asyncio.gather(*(
+            self.request(client, method, path)
+            for client, path in zip(self.clients, paths)
+        ))
+
+    def round(self, method, paths):
+        return async_to_sync(self.gather)(method, paths)
+
+    def close(self):
+        self.urlconf.disable()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержки и число SQL-запросов эндпоинтов API внутри '
+        'процесса'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--endpoint', action='append', choices=sorted(ENDPOINTS),
+            help='Эндпоинт для замера (можно указать несколько раз)'
+        )
+        parser.add_argument('--iterations', type=int, default=100)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--user', help='username пользователя для авторизованных запросов'
+        )
+        parser.add_argument(
+            '--asgi', action='store_true',
+            help='Через ASGI и async-представления вместо WSGI'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Число одновременных запросов в каждой итерации'
+        )
+        parser.add_argument(
+            '--json', action='store_true', help='Вывести результат в JSON'
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        concurrency = max(options['concurrency'], 1)
+        slots = self.get_slots(user, concurrency)
+        token = Token.objects.get_or_create(user=user)[0].key
+        # Под async_to_sync SQL async ORM выполняется в этом потоке.
+        install_query_observer()
+        runner = (AsgiRunner if options['asgi'] else WsgiRunner)(
+            token, concurrency
+        )
+        results = []
+        try:
+            for name in options['endpoint'] or ENDPOINTS:
+                results.append(self.measure(runner, name, slots, options))
+        finally:
+            runner.close()
+        if options['json']:
+            self.stdout.write(
+                json.dumps(results, ensure_ascii=False, indent=2)
+            )
+            return
+        self.stdout.write(
+            f'{"endpoint":<24}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+            f'{"rps":>9}{"queries":>9}{"db ms":>9}{"errors":>8}'
+        )
+        for row in results:
+            self.stdout.write(
+                f'{row["endpoint"]:<24}{row["p50_ms"]:>10}{row["p95_ms"]:>10}'
+                f'{row["p99_ms"]:>10}{row["rps"]:>9}{row["queries"]:>9}'
+                f'{row["db_ms"]:>9}{row["errors"]:>8}'
+            )
+
+    def measure(self, runner, name, slots, options):
+        paths = [ENDPOINTS[name].format(**slot) for slot in slots]
+        methods = ('post', 'delete') if name in TOGGLES else ('get',)
+        for _ in range(options['warmup']):
+            for method in methods:
+                runner.round(method, paths)
+        samples = []
+        started = time.perf_counter()
+        for _ in range(options['iterations']):
+            for method in methods:
+                samples += runner.round(method, paths)
+        wall = time.perf_counter() - started
+        latencies = [sample[0] * 1000 for sample in samples]
+        return {
+            'endpoint': name,
+            'path': paths[0],
+            'iterations': len(samples),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'rps': round(len(samples) / wall, 1),
+            'queries': max(sample[1] for sample in samples),
+            'db_ms': round(
+                sum(sample[2] for sample in samples) * 1000 / len(samples), 2
+            ),
+            'errors': sum(sample[3] >= 400 for sample in samples),
+        }
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Пользователь {username} не найден.')
+        user = User.objects.filter(
+            follower__isnull=False
+        ).order_by('id').first()
+        if user is None:
+            raise CommandError(
+                'Нет пользователей с подписками, укажите --user.'
+            )
+        return user
+
+    def get_slots(self, user, concurrency):
+        """
+        Параметры путей для каждого из одновременных запросов: переключатели
+        получают разные рецепты и авторов, чтобы не мешать друг другу.
+        """
+        recipe = Recipe.objects.order_by('id').first()
+        if recipe is None:
+            raise CommandError('В базе нет рецептов.')
+        free_recipes = list(Recipe.objects.exclude(
+            favorites__user=user
+        ).exclude(in_shopping_cart__user=user).order_by('id').values_list(
+            'id', flat=True
+        )[:concurrency])
+        free_authors = list(User.objects.exclude(
+            following__user=user
+        ).exclude(pk=user.pk).order_by('id').values_list(
+            'id', flat=True
+        )[:concurrency])
+        if len(free_recipes) < concurrency or len(free_authors) < concurrency:
+            raise CommandError(
+                'Не хватает рецептов или авторов, не связанных с '
+                'пользователем, для замера переключателей.'
+            )
+        return [
+            {
+                'recipe_id': recipe.id,
+                'free_recipe_id': free_recipe_id,
+                'free_author_id': free_author_id,
+            }
+            for free_recipe_id, free_author_id in zip(
+                free_recipes, free_authors
+            )
+        ]
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from foodgram.images import create_derivatives, derivative_name
+from recipes.models import Recipe
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии и WebP для уже загруженных изображений'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать производные, даже если они уже есть'
+        )
+
+    def handle(self, *args, **options):
+        sources = [
+            (Recipe.objects.exclude(image=''), 'image'),
+            (
+                CustomUser.objects.exclude(avatar='').exclude(avatar=None),
+                'avatar'
+            ),
+        ]
+        created = 0
+        for queryset, field_name in sources:
+            for obj in queryset.only('pk', field_name).iterator():
+                field_file = getattr(obj, field_name)
+                if not options['force'] and all(
+                    field_file.storage.exists(
+                        derivative_name(field_file.name, kind)
+                    )
+                    for kind in settings.IMAGE_DERIVATIVES
+                ):
+                    continue
+                create_derivatives(field_file)
+                created += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано изображений: {created}')
+        )
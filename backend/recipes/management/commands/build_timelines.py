@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from recipes import feed
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Заранее раскладывает ленты пользователей с большим числом подписок '
+        'в таблицу TimelineEntry'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold', type=int, default=settings.FEED_TIMELINE_THRESHOLD,
+            help='Минимальное число подписок для готовой ленты'
+        )
+        parser.add_argument('--user', help='username пользователя')
+        parser.add_argument(
+            '--drop', action='store_true',
+            help='Удалить готовую ленту и вернуться к запросу по подпискам'
+        )
+
+    def handle(self, *args, **options):
+        if options['user']:
+            try:
+                user_ids = [
+                    CustomUser.objects.get(username=options['user']).id
+                ]
+            except CustomUser.DoesNotExist:
+                raise CommandError(
+                    f'Пользователь {options["user"]} не найден.'
+                )
+        else:
+            user_ids = list(CustomUser.objects.annotate(
+                follows=Count('follower')
+            ).filter(follows__gte=options['threshold']).values_list(
+                'id', flat=True
+            ))
+        for user_id in user_ids:
+            with transaction.atomic():
+                if options['drop']:
+                    feed.drop_timeline(user_id)
+                else:
+                    feed.build_timeline(user_id)
+        action = 'удалены' if options['drop'] else 'построены'
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты {action}: {len(user_ids)}'
+        ))
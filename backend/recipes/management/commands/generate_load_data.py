@@ -0,0 +1,173 @@
+import io
+import random
+import time
+from array import array
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+from foodgram.images import create_derivatives
+from recipes.models import (
+    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart
+)
+from users.models import Follow
+
+User = get_user_model()
+
+PLACEHOLDER_IMAGE = 'recipes/load-placeholder.jpg'
+
+
+class Command(BaseCommand):
+    help = (
+        'Массово создает пользователей, рецепты и связи для нагрузочного '
+        'тестирования'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=10)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--cart-per-user', type=int, default=5)
+        parser.add_argument('--follows-per-user', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='load')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if len(ingredient_ids) < options['ingredients_per_recipe']:
+            raise CommandError(
+                'Недостаточно ингредиентов в базе. Сначала загрузите их.'
+            )
+
+        started = time.monotonic()
+        user_ids = self.create_users(options['users'], options['prefix'])
+        recipe_ids = self.create_recipes(
+            options['recipes'], user_ids, ingredient_ids,
+            options['ingredients_per_recipe']
+        )
+        self.create_links(
+            Favorite, user_ids, recipe_ids,
+            options['favorites_per_user'], 'recipe_id'
+        )
+        self.create_links(
+            ShoppingCart, user_ids, recipe_ids,
+            options['cart_per_user'], 'recipe_id'
+        )
+        self.create_links(
+            Follow, user_ids, user_ids,
+            options['follows_per_user'], 'author_id'
+        )
+        call_command('recount_counters', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        call_command('rebuild_shopping_lists', stdout=self.stdout)
+        call_command('build_timelines', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с: '
+            f'пользователей {len(user_ids)}, рецептов {len(recipe_ids)}'
+        ))
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    def create_users(self, total, prefix):
+        offset = User.objects.filter(username__startswith=f'{prefix}_').count()
+        password = make_password('loadtest12345')
+        user_ids = array('q')
+        for start, size in self.batches(total):
+            with transaction.atomic():
+                users = User.objects.bulk_create(
+                    User(
+                        username=f'{prefix}_{number}',
+                        email=f'{prefix}_{number}@example.com',
+                        first_name='Нагрузка',
+                        last_name=str(number),
+                        password=password,
+                    )
+                    for number in range(offset + start, offset + start + size)
+                )
+            user_ids.extend(user.id for user in users)
+            self.progress('Пользователи', start + size, total)
+        return user_ids
+
+    def placeholder_image(self):
+        if not default_storage.exists(PLACEHOLDER_IMAGE):
+            buffer = io.BytesIO()
+            Image.new('RGB', (800, 600), color=(180, 140, 90)).save(
+                buffer, 'JPEG'
+            )
+            name = default_storage.save(
+                PLACEHOLDER_IMAGE, ContentFile(buffer.getvalue())
+            )
+            create_derivatives(Recipe(image=name).image)
+        return PLACEHOLDER_IMAGE
+
+    def create_recipes(self, total, user_ids, ingredient_ids, per_recipe):
+        if not user_ids:
+            user_ids = array('q', User.objects.values_list('id', flat=True))
+        image = self.placeholder_image()
+        recipe_ids = array('q')
+        for start, size in self.batches(total):
+            with transaction.atomic():
+                recipes = Recipe.objects.bulk_create(
+                    Recipe(
+                        author_id=self.random.choice(user_ids),
+                        name=f'Рецепт для нагрузки {start + i}',
+                        text=(
+                            'Сгенерированный рецепт для нагрузочного '
+                            'тестирования.'
+                        ),
+                        cooking_time=self.random.randint(5, 180),
+                        image=image,
+                    )
+                    for i in range(size)
+                )
+                IngredientInRecipe.objects.bulk_create(
+                    (
+                        IngredientInRecipe(
+                            recipe_id=recipe.id,
+                            ingredient_id=ingredient_id,
+                            amount=self.random.randint(1, 500),
+                        )
+                        for recipe in recipes
+                        for ingredient_id in self.random.sample(
+                            ingredient_ids, per_recipe
+                        )
+                    ),
+                    batch_size=self.batch_size,
+                )
+            recipe_ids.extend(recipe.id for recipe in recipes)
+            self.progress('Рецепты', start + size, total)
+        return recipe_ids
+
+    def create_links(self, model, user_ids, target_ids, per_user,
+                     target_field):
+        if not per_user or not target_ids:
+            return
+        per_user = min(per_user, len(target_ids) - 1)
+        rows = []
+        for position, user_id in enumerate(user_ids, start=1):
+            for target_id in set(self.random.sample(target_ids, per_user)):
+                if target_id != user_id or target_field != 'author_id':
+                    rows.append(
+                        model(user_id=user_id, **{target_field: target_id})
+                    )
+            if len(rows) >= self.batch_size or position == len(user_ids):
+                with transaction.atomic():
+                    model.objects.bulk_create(rows, ignore_conflicts=True)
+                rows = []
+                self.progress(
+                    model._meta.verbose_name_plural, position, len(user_ids)
+                )
+
+    def progress(self, label, done, total):
+        self.stdout.write(f'{label}: {done}/{total}')
@@ -1,24 +1,106 @@
+import csv
 import json
-from django.core.management.base import BaseCommand
+import os
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from recipes.catalog import ingredient_index
 from recipes.models import Ingredient
 
+READ_SIZE = 64 * 1024
+
+
+def read_json(file):
+    """Построчно разбирает JSON-массив объектов, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise ValueError('Ожидался JSON-массив')
+            started = True
+            position += 1
+            continue
+        if started and position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(READ_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item['name'], item['measurement_unit']
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row:
+            name, measurement_unit = row
+            yield name, measurement_unit
+
+
+READERS = {'.json': read_json, '.csv': read_csv}
+
 
 class Command(BaseCommand):
-    help = 'Загружает ингредиенты из JSON-файла'
+    help = 'Загружает ингредиенты из JSON- или CSV-файла'
 
     def add_arguments(self, parser):
-        parser.add_argument('file_path', type=str, help='Путь к JSON-файлу')
+        parser.add_argument(
+            'file_path', type=str, help='Путь к JSON- или CSV-файлу'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
 
     def handle(self, *args, **options):
         file_path = options['file_path']
+        reader = READERS.get(os.path.splitext(file_path)[1].lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .json и .csv')
+        existing = set(
+            Ingredient.objects.values_list('name', 'measurement_unit')
+        )
+        read = inserted = 0
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for item in data:
-                    Ingredient.objects.get_or_create(
-                        name=item['name'],
-                        measurement_unit=item['measurement_unit']
-                    )
-            self.stdout.write(self.style.SUCCESS('Ингредиенты успешно загружены'))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Ошибка: {e}'))
\ No newline at end of file
+                items = reader(f)
+                while batch := list(islice(items, options['batch_size'])):
+                    read += len(batch)
+                    new = []
+                    for key in batch:
+                        if key not in existing:
+                            existing.add(key)
+                            new.append(Ingredient(
+                                name=key[0], measurement_unit=key[1]
+                            ))
+                    if new:
+                        # ignore_conflicts не сообщает, какие строки уже
+                        # добавил параллельный процесс: считаем по таблице.
+                        before = Ingredient.objects.count()
+                        Ingredient.objects.bulk_create(
+                            new, ignore_conflicts=True
+                        )
+                        inserted += Ingredient.objects.count() - before
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise CommandError(f'Ошибка чтения {file_path}: {e!r}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Ингредиенты загружены: добавлено {inserted}, '
+            f'пропущено {read - inserted}'
+        ))
+        if inserted:
+            ingredient_index.invalidate()
+            if settings.SHARED_CACHE_ALIAS is None:
+                self.stdout.write(
+                    'Общий кеш не настроен: запущенные процессы увидят '
+                    'новые ингредиенты не позже чем через '
+                    f'{settings.INGREDIENT_INDEX_MAX_AGE} с.'
+                )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes import shopping_list
+
+
+class Command(BaseCommand):
+    help = 'Сверяет итоги списков покупок с корзинами и пересобирает их'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сообщить о расхождениях, не исправляя их'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            mismatches = shopping_list.count_mismatches()
+            if not options['check']:
+                shopping_list.rebuild()
+        if options['check']:
+            if mismatches:
+                raise CommandError(
+                    f'Расхождений в списках покупок: {mismatches}'
+                )
+            self.stdout.write(self.style.SUCCESS('Списки покупок согласованы'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, исправлено расхождений: {mismatches}'
+        ))
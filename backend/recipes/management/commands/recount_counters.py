@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.counters import recount
+from recipes.models import Recipe, Favorite, ShoppingCart
+from users.models import CustomUser, Follow
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики избранного, корзины, рецептов и подписчиков'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount(Recipe, CustomUser, Favorite, ShoppingCart, Follow)
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны'))
@@ -0,0 +1,30 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файл реплики: локальная замена '
+        'репликации для проверки чтения с реплики'
+    )
+
+    def handle(self, *args, **options):
+        alias = settings.REPLICA_DATABASE
+        if alias not in settings.DATABASES:
+            raise CommandError('Реплика не настроена (DB_REPLICA_NAME).')
+        primary = connections[DEFAULT_DB_ALIAS]
+        replica = settings.DATABASES[alias]
+        if primary.vendor != 'sqlite' or 'sqlite' not in replica['ENGINE']:
+            raise CommandError('Команда работает только с SQLite.')
+        primary.ensure_connection()
+        target = sqlite3.connect(replica['NAME'])
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Реплика {replica["NAME"]} обновлена'
+        ))
@@ -0,0 +1,53 @@
+import datetime
+
+from django.db import migrations, models
+from django.db.models import Max
+import django.utils.timezone
+
+
+def stagger_created_at(apps, schema_editor):
+    """
+    AddField проставил всем рецептам одно и то же время. Разводим его
+    на id микросекунд, чтобы курсорная пагинация по created_at сохранила
+    прежний порядок по id.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    max_id = Recipe.objects.aggregate(max_id=Max('id'))['max_id']
+    if max_id is None:
+        return
+    base = django.utils.timezone.now() - datetime.timedelta(
+        microseconds=max_id
+    )
+    batch = []
+    for recipe in Recipe.objects.only('id').iterator(chunk_size=1000):
+        recipe.created_at = base + datetime.timedelta(microseconds=recipe.id)
+        batch.append(recipe)
+        if len(batch) == 1000:
+            Recipe.objects.bulk_update(batch, ['created_at'])
+            batch = []
+    Recipe.objects.bulk_update(batch, ['created_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ('-created_at', '-id')},
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(stagger_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-created_at', '-id'], name='recipe_created_at_id_idx'),
+        ),
+    ]
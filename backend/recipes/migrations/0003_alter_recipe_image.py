@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:13
+
+from django.db import migrations
+import foodgram.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipe_created_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=foodgram.images.DerivativeImageField(upload_to='recipes/'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """
+    Дубликаты ингредиента сливаются в запись с меньшим id. Если рецепт
+    ссылается на несколько записей группы, остается одна строка состава
+    с суммарным количеством.
+    """
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(total=Count('id'), keep_id=Min('id')).filter(total__gt=1)
+    for group in duplicates:
+        keep_id = group['keep_id']
+        group_ids = list(Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).values_list('id', flat=True))
+        shared = IngredientInRecipe.objects.filter(
+            ingredient_id__in=group_ids
+        ).values('recipe_id').annotate(
+            rows=Count('id'), amount=Sum('amount')
+        ).filter(rows__gt=1)
+        for recipe in shared:
+            rows = list(IngredientInRecipe.objects.filter(
+                recipe_id=recipe['recipe_id'], ingredient_id__in=group_ids
+            ).order_by('id'))
+            survivor = next(
+                (row for row in rows if row.ingredient_id == keep_id), rows[0]
+            )
+            IngredientInRecipe.objects.filter(
+                id__in=[row.id for row in rows if row.id != survivor.id]
+            ).delete()
+            survivor.ingredient_id = keep_id
+            survivor.amount = recipe['amount']
+            survivor.save(update_fields=['ingredient', 'amount'])
+        duplicate_ids = [pk for pk in group_ids if pk != keep_id]
+        IngredientInRecipe.objects.filter(
+            ingredient_id__in=duplicate_ids
+        ).update(ingredient_id=keep_id)
+        Ingredient.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_alter_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
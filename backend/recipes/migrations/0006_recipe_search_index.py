@@ -0,0 +1,65 @@
+from django.db import migrations
+
+FTS_TABLE = 'recipes_recipe_fts'
+
+INGREDIENT_NAMES = (
+    "SELECT {aggregate} FROM recipes_ingredientinrecipe ir "
+    "JOIN recipes_ingredient i ON i.id = ir.ingredient_id "
+    "WHERE ir.recipe_id = r.id"
+)
+
+POSTGRES_UPDATE = (
+    "UPDATE recipes_recipe r SET search_vector = "
+    "setweight(to_tsvector('russian', r.name), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(("
+    + INGREDIENT_NAMES.format(aggregate="string_agg(i.name, ' ')")
+    + "), '')), 'B') || "
+    "setweight(to_tsvector('russian', r.text), 'C')"
+)
+
+SQLITE_INSERT = (
+    f"INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) "
+    "SELECT r.id, r.name, coalesce(("
+    + INGREDIENT_NAMES.format(aggregate="group_concat(i.name, ' ')")
+    + "), ''), r.text FROM recipes_recipe r"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector'
+        )
+        schema_editor.execute(
+            'CREATE INDEX recipe_search_vector_idx ON recipes_recipe '
+            'USING GIN (search_vector)'
+        )
+        schema_editor.execute(POSTGRES_UPDATE)
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            "name, ingredients, text, tokenize = 'unicode61')"
+        )
+        schema_editor.execute(SQLITE_INSERT)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe DROP COLUMN search_vector'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_favorites_count_recipe_shopping_cart_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations, models
+
+import recipes.models
+
+BATCH_SIZE = 1000
+
+
+def fill_short_codes(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    ids = list(Recipe.objects.values_list('id', flat=True))
+    used = set()
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = []
+        for pk in ids[start:start + BATCH_SIZE]:
+            code = recipes.models.generate_short_code()
+            while code in used:
+                code = recipes.models.generate_short_code()
+            used.add(code)
+            batch.append(Recipe(id=pk, short_code=code))
+        Recipe.objects.bulk_update(batch, ['short_code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='short_code',
+            field=models.CharField(max_length=16, null=True, editable=False),
+        ),
+        migrations.RunPython(fill_short_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='recipe',
+            name='short_code',
+            field=models.CharField(default=recipes.models.generate_short_code, editable=False, max_length=16, unique=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='clicks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,24 +1,94 @@
 from django.db import models
-from users.models import CustomUser
+from django.db.models import Exists, OuterRef, Prefetch, Value
+from foodgram.images import DerivativeImageField
+from users.models import CustomUser, Follow
 import uuid
 import shortuuid
 
 
+def generate_short_code():
+    return shortuuid.uuid()[:8]
+
+
 class Ingredient(models.Model):
     name = models.CharField(max_length=200)
     measurement_unit = models.CharField(max_length=200)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            Prefetch(
+                'ingredientinrecipe_set',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+
+    def with_user_flags(self, user):
+        if not user or not user.is_authenticated:
+            return self.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                author_is_subscribed=Value(False)
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            author_is_subscribed=Exists(
+                Follow.objects.filter(user=user, author=OuterRef('author'))
+            )
+        )
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='recipes')
     name = models.CharField(max_length=200)
-    image = models.ImageField(upload_to='recipes/')
+    image = DerivativeImageField(upload_to='recipes/')
     text = models.TextField()
     ingredients = models.ManyToManyField(Ingredient, through='IngredientInRecipe')
     cooking_time = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    short_code = models.CharField(
+        max_length=16, unique=True, default=generate_short_code,
+        editable=False
+    )
+    clicks = models.PositiveIntegerField(default=0)
+    favorites_count = models.PositiveIntegerField(default=0)
+    shopping_cart_count = models.PositiveIntegerField(default=0)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('-created_at', '-id')
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='recipe_created_at_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-created_at', '-id'],
+                name='recipe_author_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -48,6 +118,50 @@ class ShoppingCart(models.Model):
         unique_together = ('user', 'recipe')
 
 
-def generate_short_code():
-    return shortuuid.uuid()[:8]
+class ShoppingListItem(models.Model):
+    """Суммарное количество ингредиента по всем рецептам в корзине."""
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name='shopping_list'
+    )
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    total_amount = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            ),
+        ]
+
+
+class Timeline(models.Model):
+    """Отметка о том, что ленту пользователя читаем из TimelineEntry."""
+    user = models.OneToOneField(
+        CustomUser, on_delete=models.CASCADE, primary_key=True,
+        related_name='timeline'
+    )
+    built_at = models.DateTimeField(auto_now=True)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name='timeline_entries'
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name='timeline_entries'
+    )
+    created_at = models.DateTimeField()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created_at', '-recipe'],
+                name='timeline_user_created_idx'
+            ),
+        ]
@@ -0,0 +1,124 @@
+"""
+Полнотекстовый поиск по рецептам.
+
+На PostgreSQL документ хранится в колонке recipes_recipe.search_vector
+(tsvector с GIN-индексом), на SQLite - в виртуальной таблице FTS5
+recipes_recipe_fts с rowid = id рецепта. Обе структуры создаются миграцией
+и не описаны в модели: ORM о них не знает, поиск идет через RawSQL.
+Документы обновляются после коммита по сигналам сохранения Recipe и
+переименования Ingredient (recipes.signals).
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'recipes_recipe_fts'
+TS_CONFIG = 'russian'
+
+INGREDIENT_NAMES = (
+    "SELECT {aggregate} FROM recipes_ingredientinrecipe ir "
+    "JOIN recipes_ingredient i ON i.id = ir.ingredient_id "
+    "WHERE ir.recipe_id = r.id"
+)
+
+POSTGRES_UPDATE = (
+    "UPDATE recipes_recipe r SET search_vector = "
+    "setweight(to_tsvector(%(config)s, r.name), 'A') || "
+    "setweight(to_tsvector(%(config)s, coalesce(("
+    + INGREDIENT_NAMES.format(aggregate="string_agg(i.name, ' ')")
+    + "), '')), 'B') || "
+    "setweight(to_tsvector(%(config)s, r.text), 'C')"
+)
+
+SQLITE_INSERT = (
+    f"INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) "
+    "SELECT r.id, r.name, coalesce(("
+    + INGREDIENT_NAMES.format(aggregate="group_concat(i.name, ' ')")
+    + "), ''), r.text FROM recipes_recipe r"
+)
+
+
+def placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def update_index(recipe_ids=None, using=connection):
+    """Переиндексирует рецепты recipe_ids или, если не заданы, все."""
+    if recipe_ids is not None:
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+    with using.cursor() as cursor:
+        if using.vendor == 'postgresql':
+            sql, params = POSTGRES_UPDATE, {'config': TS_CONFIG}
+            if recipe_ids is not None:
+                sql += ' WHERE r.id = ANY(%(ids)s)'
+                params['ids'] = recipe_ids
+            cursor.execute(sql, params)
+        elif using.vendor == 'sqlite':
+            remove_from_index(recipe_ids, using)
+            sql, params = SQLITE_INSERT, []
+            if recipe_ids is not None:
+                sql += f' WHERE r.id IN ({placeholders(recipe_ids)})'
+                params = recipe_ids
+            cursor.execute(sql, params)
+
+
+def update_index_on_commit(recipe_ids):
+    """Переиндексирует рецепты после коммита, когда состав уже записан."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(lambda: update_index(recipe_ids))
+
+
+def remove_from_index(recipe_ids=None, using=connection):
+    if using.vendor != 'sqlite':
+        return
+    with using.cursor() as cursor:
+        if recipe_ids is None:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        elif recipe_ids:
+            recipe_ids = list(recipe_ids)
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN '
+                f'({placeholders(recipe_ids)})',
+                recipe_ids
+            )
+
+
+def terms(query):
+    return re.findall(r'\w+', query.lower())[:10]
+
+
+def search(queryset, query):
+    """Фильтрует queryset по запросу и сортирует по релевантности."""
+    words = terms(query)
+    if not words:
+        return queryset
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        tsquery = ' & '.join(f'{word}:*' for word in words)
+        queryset = queryset.filter(RawSQL(
+            'recipes_recipe.search_vector @@ to_tsquery(%s, %s)',
+            [TS_CONFIG, tsquery], output_field=BooleanField()
+        )).annotate(search_rank=RawSQL(
+            'ts_rank(recipes_recipe.search_vector, to_tsquery(%s, %s))',
+            [TS_CONFIG, tsquery], output_field=FloatField()
+        ))
+    elif vendor == 'sqlite':
+        match = ' '.join(f'"{word}"*' for word in words)
+        queryset = queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [match]
+        )).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, 10.0, 5.0, 1.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = recipes_recipe.id',
+            [match], output_field=FloatField()
+        ))
+    else:
+        for word in words:
+            queryset = queryset.filter(name__icontains=word)
+        return queryset
+    return queryset.order_by('-search_rank', '-created_at', '-id')
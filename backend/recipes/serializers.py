@@ -1,6 +1,10 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import Recipe, Ingredient, IngredientInRecipe
+from . import shopping_list
+from .catalog import recipe_ingredient_index
+from .models import Recipe, Ingredient, IngredientInRecipe, ShoppingListItem
 from .fields import Base64ImageField
+from foodgram.images import ImageVariantsField
 from users.serializers import CustomUserSerializer
 
 
@@ -10,6 +14,19 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'measurement_unit']
 
 
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='ingredient.id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit'
+    )
+    amount = serializers.IntegerField(source='total_amount')
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ['id', 'name', 'measurement_unit', 'amount']
+
+
 class IngredientAmountSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(source='ingredient.id')
     name = serializers.CharField(source='ingredient.name')
@@ -27,15 +44,18 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
 
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField(source='image')
+
     class Meta:
         model = Recipe
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_variants', 'cooking_time']
 
 
 class RecipeSerializer(serializers.ModelSerializer):
     ingredients = IngredientAmountSerializer(source='ingredientinrecipe_set', many=True)
     author = CustomUserSerializer(read_only=True)
     image = Base64ImageField()
+    image_variants = ImageVariantsField(source='image')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -43,10 +63,18 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = [
             'id', 'author', 'name', 'text', 'cooking_time', 'image',
-            'ingredients', 'is_favorited', 'is_in_shopping_cart'
+            'image_variants', 'ingredients', 'is_favorited',
+            'is_in_shopping_cart'
         ]
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return (
             request and request.user.is_authenticated and
@@ -54,6 +82,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return (
             request and request.user.is_authenticated and
@@ -92,8 +122,14 @@ class RecipeCreateSerializer(RecipeSerializer):
             if ingredient_id in seen_ids:
                 raise serializers.ValidationError("Ингредиенты не должны повторяться.")
             seen_ids.add(ingredient_id)
-            if not Ingredient.objects.filter(id=ingredient_id).exists():
-                raise serializers.ValidationError(f"Ингредиент с ID {ingredient_id} не существует.")
+        existing_ids = set(Ingredient.objects.filter(
+            id__in=seen_ids
+        ).values_list('id', flat=True))
+        for ingredient in value:
+            if ingredient['id'] not in existing_ids:
+                raise serializers.ValidationError(
+                    f"Ингредиент с ID {ingredient['id']} не существует."
+                )
         return value
 
     def validate_cooking_time(self, value):
@@ -116,30 +152,66 @@ class RecipeCreateSerializer(RecipeSerializer):
             raise serializers.ValidationError("Название обязательно.")
         return value
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         validated_data['author'] = self.context['request'].user
         recipe = Recipe.objects.create(**validated_data)
-        for ingredient_data in ingredients_data:
-            IngredientInRecipe.objects.create(
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
                 recipe=recipe,
                 ingredient_id=ingredient_data['id'],
                 amount=ingredient_data['amount']
             )
+            for ingredient_data in ingredients_data
+        )
+        recipe_ingredient_index.refresh_on_commit([recipe.id])
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients', None)
         instance = super().update(instance, validated_data)
         if ingredients_data is not None:
-            instance.ingredients.clear()
-            for ingredient_data in ingredients_data:
-                IngredientInRecipe.objects.create(
-                    recipe=instance,
-                    ingredient_id=ingredient_data['id'],
-                    amount=ingredient_data['amount']
-                )
+            self.update_ingredients(instance, ingredients_data)
+            recipe_ingredient_index.refresh_on_commit([instance.id])
         return instance
 
+    def update_ingredients(self, recipe, ingredients_data):
+        amounts = {item['id']: item['amount'] for item in ingredients_data}
+        current = {
+            row.ingredient_id: row
+            for row in recipe.ingredientinrecipe_set.all()
+        }
+        before = {
+            ingredient_id: row.amount for ingredient_id, row in current.items()
+        }
+        IngredientInRecipe.objects.filter(
+            id__in=[
+                row.id for ingredient_id, row in current.items()
+                if ingredient_id not in amounts
+            ]
+        ).delete()
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != row.amount:
+                row.amount = amount
+                changed.append(row)
+        IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        )
+        if recipe.shopping_cart_count:
+            shopping_list.ingredients_changed(recipe.id, before, amounts)
+
     def to_representation(self, instance):
+        request = self.context.get('request')
+        instance = Recipe.objects.with_related().with_user_flags(
+            request and request.user
+        ).get(pk=instance.pk)
         return RecipeSerializer(instance, context=self.context).data
\ No newline at end of file
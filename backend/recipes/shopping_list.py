@@ -0,0 +1,176 @@
+"""
+Поддержка таблицы ShoppingListItem: итоговых количеств ингредиентов по
+корзине пользователя. Таблица меняется дельтами при добавлении и удалении
+рецептов из корзины и при изменении состава рецептов; rebuild() заново
+собирает ее из ShoppingCart и IngredientInRecipe.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+
+from .counters import delete_links
+from .models import IngredientInRecipe, ShoppingCart, ShoppingListItem
+
+REBUILD_SQL = (
+    'INSERT INTO recipes_shoppinglistitem '
+    '(user_id, ingredient_id, total_amount) '
+    'SELECT c.user_id, ir.ingredient_id, SUM(ir.amount) '
+    'FROM recipes_shoppingcart c '
+    'JOIN recipes_ingredientinrecipe ir ON ir.recipe_id = c.recipe_id '
+    'GROUP BY c.user_id, ir.ingredient_id'
+)
+
+
+def apply(deltas):
+    """Применяет изменения {(user_id, ingredient_id): delta}."""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    items = {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingListItem.objects.select_for_update().filter(
+            user_id__in={user_id for user_id, _ in deltas},
+            ingredient_id__in={ingredient_id for _, ingredient_id in deltas}
+        )
+    }
+    created, changed, emptied = [], [], []
+    for (user_id, ingredient_id), delta in deltas.items():
+        item = items.get((user_id, ingredient_id))
+        if item is None:
+            if delta > 0:
+                created.append(ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    total_amount=delta
+                ))
+        elif item.total_amount + delta > 0:
+            item.total_amount += delta
+            changed.append(item)
+        else:
+            emptied.append(item.id)
+    ShoppingListItem.objects.filter(id__in=emptied).delete()
+    ShoppingListItem.objects.bulk_update(changed, ['total_amount'])
+    ShoppingListItem.objects.bulk_create(created)
+
+
+def cart_changed(pairs, sign):
+    """
+    Учитывает добавление (sign=1) или удаление (sign=-1) рецептов из
+    корзин; pairs - пары (user_id, recipe_id).
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return
+    amounts = defaultdict(list)
+    for recipe_id, ingredient_id, amount in IngredientInRecipe.objects.filter(
+        recipe_id__in={recipe_id for _, recipe_id in pairs}
+    ).values_list('recipe_id', 'ingredient_id', 'amount'):
+        amounts[recipe_id].append((ingredient_id, amount))
+    deltas = defaultdict(int)
+    for user_id, recipe_id in pairs:
+        for ingredient_id, amount in amounts[recipe_id]:
+            deltas[user_id, ingredient_id] += sign * amount
+    apply(deltas)
+
+
+@transaction.atomic
+def add_to_cart(user, recipe):
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    cart_changed([(user.id, recipe.id)], 1)
+
+
+@transaction.atomic
+def remove_from_cart(user, recipe):
+    removed = delete_links(
+        ShoppingCart.objects.filter(user=user, recipe=recipe),
+        'recipe', 'shopping_cart_count'
+    )
+    cart_changed([(user.id, recipe_id) for recipe_id in removed], -1)
+
+
+def recipe_deleted(recipe_ids):
+    """Вызывается до удаления рецептов, пока их состав еще в базе."""
+    cart_changed(
+        ShoppingCart.objects.filter(recipe_id__in=recipe_ids).values_list(
+            'user_id', 'recipe_id'
+        ),
+        -1
+    )
+
+
+def ingredients_changed(recipe_id, before, after):
+    """before и after - составы рецепта {ingredient_id: amount}."""
+    changes = {
+        ingredient_id:
+            after.get(ingredient_id, 0) - before.get(ingredient_id, 0)
+        for ingredient_id in before.keys() | after.keys()
+    }
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    apply({
+        (user_id, ingredient_id): delta
+        for user_id in ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True)
+        for ingredient_id, delta in changes.items()
+    })
+
+
+def expected_rows(using=connection):
+    with using.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.user_id, ir.ingredient_id, SUM(ir.amount) '
+            'FROM recipes_shoppingcart c '
+            'JOIN recipes_ingredientinrecipe ir ON ir.recipe_id = c.recipe_id '
+            'GROUP BY c.user_id, ir.ingredient_id '
+            'ORDER BY c.user_id, ir.ingredient_id'
+        )
+        yield from cursor
+
+
+def stored_rows(using=connection):
+    with using.cursor() as cursor:
+        cursor.execute(
+            'SELECT user_id, ingredient_id, total_amount '
+            'FROM recipes_shoppinglistitem ORDER BY user_id, ingredient_id'
+        )
+        yield from cursor
+
+
+def count_mismatches(using=connection):
+    """
+    Число расхождений таблицы с исходными данными (слиянием двух выборок).
+    """
+    mismatches = 0
+    expected, stored = expected_rows(using), stored_rows(using)
+    left, right = next(expected, None), next(stored, None)
+    while left is not None or right is not None:
+        if right is None or (left is not None and left[:2] < right[:2]):
+            mismatches += 1
+            left = next(expected, None)
+        elif left is None or right[:2] < left[:2]:
+            mismatches += 1
+            right = next(stored, None)
+        else:
+            mismatches += left[2] != right[2]
+            left, right = next(expected, None), next(stored, None)
+    return mismatches
+
+
+def rebuild(user_ids=None, using=connection):
+    """Пересобирает списки пользователей user_ids или, если не заданы, все."""
+    delete_sql, insert_sql, params = (
+        'DELETE FROM recipes_shoppinglistitem', REBUILD_SQL, []
+    )
+    if user_ids is not None:
+        params = list(set(user_ids))
+        if not params:
+            return
+        placeholders = ', '.join(['%s'] * len(params))
+        delete_sql += f' WHERE user_id IN ({placeholders})'
+        insert_sql = insert_sql.replace(
+            ' GROUP BY', f' WHERE c.user_id IN ({placeholders}) GROUP BY'
+        )
+    with using.cursor() as cursor:
+        cursor.execute(delete_sql, params)
+        cursor.execute(insert_sql, params)
@@ -0,0 +1,111 @@
+"""
+Короткие ссылки /s/<code>/ на рецепты.
+
+Код разрешается в id рецепта через кеш; неизвестные коды тоже кешируются
+(на SHORT_LINK_NEGATIVE_TIMEOUT), чтобы перебор не доходил до БД. Переходы
+копятся в памяти процесса и сбрасываются в Recipe.clicks пачкой раз в
+SHORT_LINK_FLUSH_INTERVAL секунд или по достижении SHORT_LINK_FLUSH_SIZE.
+"""
+import atexit
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+
+from .models import Recipe
+
+MISSING = 0
+
+
+def cache_key(code):
+    return f'short-link:{code}'
+
+
+def get_cache():
+    return caches[settings.SHORT_LINK_CACHE_ALIAS]
+
+
+def lookup(code):
+    recipe_id = Recipe.objects.filter(short_code=code).values_list(
+        'id', flat=True
+    ).first()
+    if recipe_id is None and code.isdigit():
+        # Ссылки вида /s/<id>/, выданные до появления коротких кодов.
+        recipe_id = Recipe.objects.filter(id=code).values_list(
+            'id', flat=True
+        ).first()
+    return recipe_id
+
+
+def resolve(code):
+    """id рецепта по короткому коду или None."""
+    cache = get_cache()
+    recipe_id = cache.get(cache_key(code))
+    if recipe_id is None:
+        recipe_id = lookup(code)
+        if recipe_id is None:
+            cache.set(
+                cache_key(code), MISSING, settings.SHORT_LINK_NEGATIVE_TIMEOUT
+            )
+        else:
+            cache.set(
+                cache_key(code), recipe_id, settings.SHORT_LINK_CACHE_TIMEOUT
+            )
+    return recipe_id or None
+
+
+def remember(recipe):
+    get_cache().set(
+        cache_key(recipe.short_code), recipe.id,
+        settings.SHORT_LINK_CACHE_TIMEOUT
+    )
+
+
+def forget(*recipes):
+    get_cache().delete_many([
+        cache_key(code)
+        for recipe in recipes
+        for code in (recipe.short_code, recipe.id)
+    ])
+
+
+class ClickBuffer:
+    """Счетчики переходов в памяти процесса со сбросом в БД пачками."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clicks = Counter()
+        self._pending = 0
+        self._flushed_at = time.monotonic()
+
+    def hit(self, recipe_id):
+        with self._lock:
+            self._clicks[recipe_id] += 1
+            self._pending += 1
+            due = (
+                self._pending >= settings.SHORT_LINK_FLUSH_SIZE
+                or time.monotonic() - self._flushed_at
+                >= settings.SHORT_LINK_FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            clicks, self._clicks = self._clicks, Counter()
+            self._pending = 0
+            self._flushed_at = time.monotonic()
+        by_count = defaultdict(list)
+        for recipe_id, count in clicks.items():
+            by_count[count].append(recipe_id)
+        for count, recipe_ids in by_count.items():
+            Recipe.objects.filter(id__in=recipe_ids).update(
+                clicks=F('clicks') + count
+            )
+
+
+click_buffer = ClickBuffer()
+atexit.register(click_buffer.flush)
@@ -0,0 +1,127 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.models import CustomUser
+from . import feed, search, shopping_list, short_links
+from .catalog import ingredient_index, recipe_ingredient_index
+from .counters import increment
+from .models import (
+    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart
+)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+def recipes_with(ingredient):
+    return IngredientInRecipe.objects.filter(
+        ingredient=ingredient
+    ).values_list('recipe_id', flat=True)
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_renamed_ingredient(sender, instance, created, update_fields,
+                               **kwargs):
+    if not created and (update_fields is None or 'name' in update_fields):
+        search.update_index_on_commit(recipes_with(instance))
+
+
+@receiver(pre_delete, sender=Ingredient)
+def reindex_without_ingredient(sender, instance, **kwargs):
+    search.update_index_on_commit(recipes_with(instance))
+
+
+SEARCH_FIELDS = {'name', 'text'}
+
+COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'shopping_cart_count',
+}
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def count_added(sender, instance, created, **kwargs):
+    if created:
+        increment(
+            Recipe.objects.filter(pk=instance.recipe_id), COUNTERS[sender], 1
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def count_recipe_created(sender, instance, created, **kwargs):
+    if created:
+        increment(
+            CustomUser.objects.filter(pk=instance.author_id),
+            'recipes_count', 1
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def reindex_recipe(sender, instance, update_fields, **kwargs):
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        search.update_index_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def publish_to_timelines(sender, instance, created, **kwargs):
+    if created:
+        feed.recipe_published(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def cache_short_link(sender, instance, created, **kwargs):
+    if created:
+        short_links.remember(instance)
+
+
+def deleted_with_author(origin):
+    """Рецепт удаляется каскадом вместе с автором (см. author_deleted)."""
+    return issubclass(getattr(origin, 'model', type(origin)), CustomUser)
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_short_link(sender, instance, origin=None, **kwargs):
+    if not deleted_with_author(origin):
+        short_links.forget(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def count_recipe_deleted(sender, instance, origin=None, **kwargs):
+    if not deleted_with_author(origin):
+        increment(
+            CustomUser.objects.filter(pk=instance.author_id),
+            'recipes_count', -1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_search_index(sender, instance, origin=None, **kwargs):
+    if not deleted_with_author(origin):
+        search.remove_from_index([instance.pk])
+        recipe_ingredient_index.refresh_on_commit([instance.pk])
+
+
+@receiver(pre_delete, sender=CustomUser)
+def author_deleted(sender, instance, **kwargs):
+    """
+    Избранное и корзина пользователя удаляются каскадом без сигналов,
+    поэтому счетчики чужих рецептов уменьшаются здесь одним UPDATE на
+    таблицу. Рецепты самого пользователя обрабатываются пачкой.
+    """
+    for model, field in COUNTERS.items():
+        increment(
+            Recipe.objects.filter(
+                pk__in=model.objects.filter(user=instance).values('recipe_id')
+            ).exclude(author=instance),
+            field, -1
+        )
+    recipes = list(instance.recipes.only('id', 'short_code'))
+    if recipes:
+        recipe_ids = [recipe.id for recipe in recipes]
+        shopping_list.recipe_deleted(recipe_ids)
+        short_links.forget(*recipes)
+        search.remove_from_index(recipe_ids)
+        recipe_ingredient_index.refresh_on_commit(recipe_ids)
@@ -1,3 +1,1905 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import datetime
+import decimal
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+import zlib
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+import brotli
+from django.apps import apps as django_apps
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.urls import resolve
+from django.db.models import F
+from PIL import Image
+from django.test import (
+    AsyncClient, RequestFactory, TestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date, urlencode
+from django.utils.translation import gettext_lazy
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+from rest_framework.test import APIClient
+
+from foodgram import db_routers
+from foodgram.images import derivative_name
+from foodgram.metrics import registry
+from foodgram.renderers import ORJSONParser, ORJSONRenderer
+from users.models import CustomUser, Follow
+from . import batch, fast_serializers, feed, search, shopping_list
+from .short_links import click_buffer
+from .checks import shopping_list_font_check
+from .counters import adelete_links, delete_links
+from .catalog import (
+    IngredientIndex, ingredient_index, recipe_ingredient_index
+)
+from .management.commands.benchmark_api import ENDPOINTS
+from .management.commands.load_ingredients import READERS, read_csv
+from .serializers import RecipeSerializer
+from .models import (
+    Recipe, Ingredient, IngredientInRecipe, Favorite, ShoppingCart,
+    ShoppingListItem, TimelineEntry
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_base64_image(size=(8, 8)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color=(200, 100, 50)).save(buffer, 'PNG')
+    return (
+        'data:image/png;base64,'
+        + base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+def pdf_text(content):
+    """
+    Строки PDF от reportlab: операнды Tj, переведенные через ToUnicode
+    встроенного шрифта. Хватает для тестов, где символов меньше 128 и
+    reportlab строит одно подмножество шрифта.
+    """
+    streams = []
+    for raw in re.findall(rb'stream\r?\n(.*?)endstream', content, re.S):
+        if not raw.startswith(b'x'):
+            raw = base64.a85decode(raw.strip(), adobe=True)
+        streams.append(zlib.decompressobj().decompress(raw))
+    chars = {}
+    for stream in streams:
+        if b'begincmap' in stream:
+            chars.update(
+                (int(code, 16), chr(int(char, 16)))
+                for code, char in re.findall(
+                    rb'<([0-9A-F]{2})> <([0-9A-F]{4})>', stream
+                )
+            )
+    lines = []
+    for stream in streams:
+        for text in re.findall(rb'\(((?:\\.|[^\\)])*)\) Tj', stream):
+            codes = re.sub(
+                rb'\\([0-7]{1,3}|.)',
+                lambda match: (
+                    bytes([int(match.group(1), 8)])
+                    if match.group(1).isdigit() else match.group(1)
+                ),
+                text
+            )
+            lines.append(''.join(chars.get(code, '?') for code in codes))
+    return lines
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class QueryBudgetTestCase(TestCase):
+    """Общий набор данных и проверки бюджета запросов для API."""
+
+    USERS = 8
+    RECIPES_PER_USER = 3
+    INGREDIENTS = 30
+    INGREDIENTS_PER_RECIPE = 5
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            CustomUser.objects.create_user(
+                username=f'user{i}',
+                email=f'user{i}@example.com',
+                first_name=f'Имя{i}',
+                last_name=f'Фамилия{i}',
+                password='password12345',
+                avatar=f'users/avatars/user{i}.png'
+            )
+            for i in range(cls.USERS)
+        ]
+        cls.user = cls.users[0]
+        cls.token = Token.objects.create(user=cls.user)
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+            for i in range(cls.INGREDIENTS)
+        )
+        cls.recipes = []
+        rows = []
+        for author in cls.users:
+            for i in range(cls.RECIPES_PER_USER):
+                recipe = Recipe.objects.create(
+                    author=author,
+                    name=f'Рецепт {author.username} {i}',
+                    text='Описание',
+                    cooking_time=10 + i,
+                    image=f'recipes/{author.username}-{i}.png'
+                )
+                cls.recipes.append(recipe)
+                offset = len(cls.recipes)
+                for j in range(cls.INGREDIENTS_PER_RECIPE):
+                    rows.append(IngredientInRecipe(
+                        recipe=recipe,
+                        ingredient=cls.ingredients[
+                            (offset + j) % cls.INGREDIENTS
+                        ],
+                        amount=j + 1
+                    ))
+        IngredientInRecipe.objects.bulk_create(rows)
+        for author in cls.users[1:]:
+            Follow.objects.create(user=cls.user, author=author)
+        for recipe in cls.recipes[::2]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+        for recipe in cls.recipes[::3]:
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        shopping_list.rebuild()
+
+    def setUp(self):
+        cache.clear()
+        ingredient_index.invalidate()
+        recipe_ingredient_index.invalidate()
+        self.anon_client = APIClient()
+        self.auth_client = APIClient()
+        self.auth_client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+
+    def get_counted(self, client, path):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(path)
+            if response.streaming:
+                response.streaming_content = [response.getvalue()]
+        self.assertEqual(
+            response.status_code, 200,
+            None if response.streaming else response.content
+        )
+        return response, context
+
+    def assertQueryBudget(self, budget, client, path):
+        response, context = self.get_counted(client, path)
+        self.assertLessEqual(
+            len(context), budget,
+            f'{path}: {len(context)} запросов при бюджете {budget}:\n'
+            + '\n'.join(query['sql'] for query in context.captured_queries)
+        )
+        return response
+
+    def assertCounters(self):
+        for recipe in Recipe.objects.all():
+            self.assertEqual(recipe.favorites_count, recipe.favorites.count())
+            self.assertEqual(
+                recipe.shopping_cart_count, recipe.in_shopping_cart.count()
+            )
+        for user in CustomUser.objects.all():
+            self.assertEqual(user.recipes_count, user.recipes.count())
+            self.assertEqual(user.followers_count, user.following.count())
+
+    def assertPageBudget(self, budget, client, path, sizes=(1, 6, 12)):
+        """Число запросов не превышает бюджет и не зависит от limit."""
+        counts = {}
+        separator = '&' if '?' in path else '?'
+        for size in sizes:
+            page_path = f'{path}{separator}limit={size}'
+            response = self.assertQueryBudget(budget, client, page_path)
+            self.assertEqual(
+                len(response.json()['results']),
+                min(size, response.json()['count'])
+            )
+            counts[size] = len(self.get_counted(client, page_path)[1])
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f'{path}: число запросов зависит от размера страницы {counts}'
+        )
+
+
+class RecipeQueryBudgetTest(QueryBudgetTestCase):
+
+    def test_recipe_list_anonymous(self):
+        self.assertPageBudget(3, self.anon_client, '/api/recipes/')
+
+    def test_recipe_list_authenticated(self):
+        self.assertPageBudget(4, self.auth_client, '/api/recipes/')
+
+    def test_recipe_list_filtered(self):
+        self.assertPageBudget(
+            4, self.auth_client,
+            '/api/recipes/?is_favorited=1&is_in_shopping_cart=1'
+        )
+
+    def test_recipe_detail(self):
+        self.assertQueryBudget(
+            3, self.auth_client, f'/api/recipes/{self.recipes[0].id}/'
+        )
+
+    def test_ingredient_list(self):
+        self.assertQueryBudget(1, self.anon_client, '/api/ingredients/')
+
+    def test_ingredient_search(self):
+        self.assertQueryBudget(
+            1, self.anon_client, '/api/ingredients/?name=ингр'
+        )
+        self.assertQueryBudget(
+            0, self.anon_client, '/api/ingredients/?name=ИНГРЕДИЕНТ 1'
+        )
+
+    def test_download_shopping_cart(self):
+        response = self.assertQueryBudget(
+            2, self.auth_client, '/api/recipes/download_shopping_cart/'
+        )
+        self.assertIn('ингредиент', b''.join(response).decode())
+
+
+class RecipeCursorPaginationTest(QueryBudgetTestCase):
+
+    def walk(self, client, path):
+        ids = []
+        while path:
+            response, context = self.get_counted(client, path)
+            self.assertNotIn('count', response.json())
+            self.assertFalse(any(
+                'COUNT(' in query['sql'] for query in context.captured_queries
+            ))
+            ids.extend(item['id'] for item in response.json()['results'])
+            path = response.json()['next']
+        return ids
+
+    def test_cursor_pages_cover_feed_in_order(self):
+        ids = self.walk(
+            self.anon_client, '/api/recipes/?pagination=cursor&limit=5'
+        )
+        expected = list(Recipe.objects.values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(ids), len(self.recipes))
+
+    def test_created_at_backfill_keeps_id_order(self):
+        Recipe.objects.update(created_at=Recipe.objects.first().created_at)
+        import_module(
+            'recipes.migrations.0002_recipe_created_at'
+        ).stagger_created_at(django_apps, None)
+        self.assertEqual(
+            list(Recipe.objects.order_by('-created_at').values_list(
+                'id', flat=True
+            )),
+            sorted((recipe.id for recipe in self.recipes), reverse=True)
+        )
+        self.assertEqual(
+            Recipe.objects.values('created_at').distinct().count(),
+            len(self.recipes)
+        )
+
+    def test_cursor_page_budget(self):
+        response = self.assertQueryBudget(
+            3, self.auth_client, '/api/recipes/?pagination=cursor&limit=4'
+        )
+        self.assertEqual(len(response.json()['results']), 4)
+        self.assertIsNone(response.json()['previous'])
+        self.assertQueryBudget(
+            3, self.auth_client, response.json()['next']
+        )
+
+    def test_limit_offset_is_default(self):
+        response = self.anon_client.get('/api/recipes/?limit=2')
+        self.assertEqual(response.json()['count'], len(self.recipes))
+
+
+class IngredientSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for name, unit in [
+            ('сахар', 'г'), ('сахарная пудра', 'г'), ('ванильный сахар', 'г'),
+            ('Сало', 'г'), ('соль', 'г'), ('ёжевика', 'г'),
+        ]:
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+
+    def setUp(self):
+        ingredient_index.invalidate()
+
+    def search(self, name):
+        response = self.client.get('/api/ingredients/', {'name': name})
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.json()]
+
+    def test_prefix_matches_come_before_substring_matches(self):
+        self.assertEqual(
+            self.search('САХ'), ['сахар', 'сахарная пудра', 'ванильный сахар']
+        )
+
+    def test_case_insensitive_cyrillic(self):
+        self.assertEqual(self.search('са'), [
+            'Сало', 'сахар', 'сахарная пудра', 'ванильный сахар'
+        ])
+        self.assertEqual(self.search('Ёж'), ['ёжевика'])
+
+    @override_settings(INGREDIENT_SEARCH_LIMIT=2)
+    def test_result_cap(self):
+        self.assertEqual(self.search('сах'), ['сахар', 'сахарная пудра'])
+
+    def test_index_rebuilt_on_change(self):
+        self.assertEqual(self.search('мёд'), [])
+        Ingredient.objects.create(name='мёд', measurement_unit='г')
+        self.assertEqual(self.search('мёд'), ['мёд'])
+        Ingredient.objects.filter(name='сахар').get().delete()
+        self.assertEqual(self.search('сахар'), [
+            'сахарная пудра', 'ванильный сахар'
+        ])
+
+    @override_settings(SHARED_CACHE_ALIAS='default')
+    def test_index_rebuilt_after_change_in_other_process(self):
+        cache.clear()
+        self.assertEqual(self.search('мёд'), [])
+        # bulk_create не шлет сигналов: так выглядит запись, сделанная
+        # другим процессом, который затем публикует новую версию.
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='мёд', measurement_unit='г')]
+        )
+        self.assertEqual(self.search('мёд'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientIndex().invalidate()
+        self.assertEqual(self.search('мёд'), ['мёд'])
+
+
+class ShoppingCartExportTest(QueryBudgetTestCase):
+    path = '/api/recipes/download_shopping_cart/'
+
+    def download(self, file_format):
+        response = self.auth_client.get(self.path, {'format': file_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            f'shopping_cart.{file_format}', response['Content-Disposition']
+        )
+        return response, b''.join(response.streaming_content)
+
+    def expected_totals(self):
+        totals = {}
+        for row in IngredientInRecipe.objects.filter(
+            recipe__in_shopping_cart__user=self.user
+        ).select_related('ingredient'):
+            name = row.ingredient.name
+            totals[name] = totals.get(name, 0) + row.amount
+        return totals
+
+    def test_txt(self):
+        response, content = self.download('txt')
+        lines = content.decode().splitlines()
+        self.assertEqual(lines[0], 'Список покупок')
+        self.assertEqual(
+            sorted(lines[2:]),
+            sorted(f'{name} - {amount} г'
+                   for name, amount in self.expected_totals().items())
+        )
+
+    def test_csv(self):
+        response, content = self.download('csv')
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(rows[0], ['Ингредиент', 'Количество', 'Единица'])
+        self.assertEqual(
+            {name: int(amount) for name, amount, _ in rows[1:]},
+            self.expected_totals()
+        )
+
+    def test_pdf(self):
+        response, content = self.download('pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+        lines = pdf_text(content)
+        self.assertEqual(lines[0], 'Список покупок')
+        self.assertEqual(
+            sorted(lines[1:]),
+            sorted(f'{name} - {amount} г'
+                   for name, amount in self.expected_totals().items())
+        )
+
+    @override_settings(SHOPPING_LIST_FONT='missing.ttf')
+    def test_missing_pdf_font_fails_check(self):
+        self.assertEqual(
+            [error.id for error in shopping_list_font_check(None)],
+            ['recipes.E001']
+        )
+
+    def test_unknown_format(self):
+        response = self.auth_client.get(self.path, {'format': 'xls'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_empty_cart(self):
+        for recipe in self.recipes[::3]:
+            self.auth_client.delete(f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.assertFalse(self.user.shopping_list.exists())
+        response = self.auth_client.get(self.path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'detail': 'Список покупок пуст.'})
+
+
+class RecipeWriteTest(QueryBudgetTestCase):
+
+    def payload(self, ingredients):
+        return {
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 15,
+            'image': make_base64_image(),
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient, amount in ingredients
+            ],
+        }
+
+    def create(self, count):
+        with CaptureQueriesContext(connection) as context:
+            response = self.auth_client.post(
+                '/api/recipes/',
+                self.payload((ingredient, 5) for ingredient
+                             in self.ingredients[:count]),
+                format='json'
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response, len(context)
+
+    def test_create_query_count_independent_of_ingredients(self):
+        self.create(1)
+        _, few = self.create(2)
+        response, many = self.create(20)
+        self.assertEqual(few, many)
+        self.assertEqual(len(response.json()['ingredients']), 20)
+
+    def test_unknown_ingredient_rejected_in_one_query(self):
+        payload = self.payload((ingredient, 1) for ingredient
+                               in self.ingredients[:10])
+        payload['ingredients'].append({'id': 10 ** 6, 'amount': 1})
+        with CaptureQueriesContext(connection) as context:
+            response = self.auth_client.post(
+                '/api/recipes/', payload, format='json'
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(10 ** 6), str(response.json()['ingredients']))
+        self.assertEqual(sum(
+            'recipes_ingredient' in query['sql']
+            for query in context.captured_queries
+        ), 1)
+
+    def test_update_only_touches_changed_rows(self):
+        recipe = self.recipes[0]
+        rows = {
+            row.ingredient_id: row
+            for row in recipe.ingredientinrecipe_set.all()
+        }
+        kept, changed, removed = list(rows)[:3]
+        added = next(
+            ingredient for ingredient in self.ingredients
+            if ingredient.id not in rows
+        )
+        payload = {'ingredients': [
+            {'id': kept, 'amount': rows[kept].amount},
+            {'id': changed, 'amount': 99},
+            {'id': added.id, 'amount': 7},
+        ]}
+        response = self.auth_client.patch(
+            f'/api/recipes/{recipe.id}/', payload, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        current = {
+            row.ingredient_id: row
+            for row in recipe.ingredientinrecipe_set.all()
+        }
+        self.assertEqual(set(current), {kept, changed, added.id})
+        self.assertEqual(current[kept].id, rows[kept].id)
+        self.assertEqual(current[changed].id, rows[changed].id)
+        self.assertEqual(current[changed].amount, 99)
+        self.assertNotIn(removed, current)
+
+    def test_create_is_atomic(self):
+        recipes_before = Recipe.objects.count()
+        with mock.patch.object(
+            IngredientInRecipe.objects, 'bulk_create',
+            side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.create(3)
+        self.assertEqual(Recipe.objects.count(), recipes_before)
+
+
+class ImageDerivativeTest(QueryBudgetTestCase):
+
+    def test_derivatives_created_on_upload(self):
+        response = self.auth_client.post('/api/recipes/', {
+            'name': 'С картинкой',
+            'text': 'Описание',
+            'cooking_time': 5,
+            'image': make_base64_image((1200, 900)),
+            'ingredients': [{'id': self.ingredients[0].id, 'amount': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        recipe = Recipe.objects.get(pk=response.json()['id'])
+        variants = response.json()['image_variants']
+        self.assertEqual(
+            set(variants), {'thumbnail', 'thumbnail_webp', 'webp'}
+        )
+        for kind, url in variants.items():
+            name = derivative_name(recipe.image.name, kind)
+            self.assertTrue(url.endswith(name))
+            with default_storage.open(name) as file:
+                image = Image.open(file)
+                if kind == 'webp':
+                    self.assertEqual(image.size, (1200, 900))
+                else:
+                    self.assertEqual(image.size, (360, 270))
+        self.assertEqual(
+            Image.open(default_storage.open(
+                derivative_name(recipe.image.name, 'thumbnail_webp')
+            )).format,
+            'WEBP'
+        )
+
+    def test_variants_in_list_and_minified(self):
+        response = self.anon_client.get('/api/recipes/?limit=1')
+        recipe = response.json()['results'][0]
+        self.assertTrue(
+            recipe['image_variants']['thumbnail'].endswith('__thumbnail.jpg')
+        )
+        self.assertIsNotNone(recipe['author']['avatar_variants'])
+        response = self.auth_client.post(
+            f'/api/recipes/{self.recipes[1].id}/favorite/'
+        )
+        self.assertIn('image_variants', response.json())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class LoadDataCommandTest(TestCase):
+
+    def test_generate_load_data_and_benchmark(self):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+            for i in range(10)
+        )
+        call_command(
+            'generate_load_data', users=12, recipes=30,
+            ingredients_per_recipe=3, favorites_per_user=4, cart_per_user=2,
+            follows_per_user=3, batch_size=7, seed=1, stdout=io.StringIO()
+        )
+        self.assertEqual(CustomUser.objects.count(), 12)
+        self.assertEqual(Recipe.objects.count(), 30)
+        self.assertEqual(IngredientInRecipe.objects.count(), 90)
+        self.assertEqual(Favorite.objects.count(), 48)
+        self.assertEqual(
+            Recipe.objects.values('image').distinct().count(), 1
+        )
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        out = io.StringIO()
+        call_command(
+            'benchmark_api', iterations=3, warmup=0, json=True, stdout=out
+        )
+        results = json.loads(out.getvalue())
+        self.assertEqual(
+            {row['endpoint'] for row in results}, set(ENDPOINTS)
+        )
+        self.assertFalse(any(row['errors'] for row in results))
+        out = io.StringIO()
+        call_command(
+            'benchmark_api', iterations=2, warmup=0, json=True, asgi=True,
+            concurrency=2, endpoint=['recipe_detail', 'favorite_toggle'],
+            stdout=out
+        )
+        results = json.loads(out.getvalue())
+        self.assertEqual([row['iterations'] for row in results], [4, 8])
+        self.assertFalse(any(row['errors'] for row in results))
+        self.assertTrue(all(row['queries'] for row in results))
+
+
+class LoadIngredientsCommandTest(TestCase):
+
+    def load(self, path, **options):
+        out = io.StringIO()
+        with CaptureQueriesContext(connection) as context:
+            call_command('load_ingredients', path, stdout=out, **options)
+        return out.getvalue(), len(context)
+
+    def test_json_and_csv_load_is_idempotent(self):
+        json_path = settings.BASE_DIR / 'data' / 'ingredients.json'
+        with open(json_path, encoding='utf-8') as file:
+            total = len(json.load(file))
+        out, _ = self.load(str(json_path), batch_size=500)
+        self.assertIn(f'добавлено {total}, пропущено 0', out)
+        self.assertEqual(Ingredient.objects.count(), total)
+        out, queries = self.load(str(json_path))
+        self.assertIn(f'добавлено 0, пропущено {total}', out)
+        self.assertEqual(queries, 1)
+        out, _ = self.load(str(settings.BASE_DIR / 'data' / 'ingredients.csv'))
+        self.assertIn('добавлено 0', out)
+        self.assertEqual(Ingredient.objects.count(), total)
+
+    def test_partial_catalog_and_small_reads(self):
+        Ingredient.objects.create(
+            name='абрикосовое варенье', measurement_unit='г'
+        )
+        path = settings.BASE_DIR / 'data' / 'ingredients.json'
+        with mock.patch(
+            'recipes.management.commands.load_ingredients.READ_SIZE', 7
+        ):
+            out, _ = self.load(str(path), batch_size=100)
+        self.assertIn('пропущено 1', out)
+        self.assertEqual(
+            Ingredient.objects.filter(name='абрикосовое варенье').count(), 1
+        )
+
+    def test_rows_inserted_concurrently_are_not_counted(self):
+        def racing_reader(file):
+            # Другой процесс успевает добавить соль после того, как
+            # команда прочитала существующие ингредиенты.
+            Ingredient.objects.create(name='соль', measurement_unit='г')
+            yield from read_csv(file)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as file:
+            file.write('соль,г\nсахар,г\nперец,г\n')
+            file.flush()
+            with mock.patch.dict(READERS, {'.csv': racing_reader}):
+                out, _ = self.load(file.name)
+        self.assertIn('добавлено 2, пропущено 1', out)
+        self.assertEqual(Ingredient.objects.count(), 3)
+
+    def test_errors_are_reported(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as file:
+            file.write('[{"name": "соль"}]')
+            file.flush()
+            with self.assertRaises(CommandError):
+                self.load(file.name)
+        with self.assertRaises(CommandError):
+            self.load('/nonexistent/ingredients.json')
+
+
+class RequestMetricsTest(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+
+    def test_server_timing_header(self):
+        response, context = self.get_counted(
+            self.auth_client, '/api/recipes/'
+        )
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(context)} queries"', timing)
+        for metric in ('db;dur=', 'render;dur=', 'app;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+
+    def test_metrics_endpoint_is_staff_only(self):
+        self.assertEqual(
+            self.anon_client.get('/api/metrics/').status_code, 401
+        )
+        self.assertEqual(
+            self.auth_client.get('/api/metrics/').status_code, 403
+        )
+
+    def metrics(self):
+        staff = APIClient()
+        staff.force_authenticate(
+            CustomUser(username='staff', is_staff=True, is_active=True)
+        )
+        response = staff.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode()
+
+    def test_route_histograms(self):
+        for _ in range(3):
+            self.anon_client.get('/api/recipes/')
+        body = self.metrics()
+        labels = 'method="GET",route="recipes-list",status="2xx"'
+        self.assertIn(
+            f'foodgram_request_duration_seconds_count{{{labels}}} 3', body
+        )
+        self.assertIn(
+            f'foodgram_request_db_queries_bucket{{{labels},le="+Inf"}} 3',
+            body
+        )
+
+    def test_worker_snapshots_are_merged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS_DIR=directory):
+                self.anon_client.get('/api/recipes/')
+                registry.maybe_flush(force=True)
+                own = os.path.join(directory, f'{os.getpid()}.json')
+                shutil.copy(
+                    own, os.path.join(directory, f'{os.getppid()}.json')
+                )
+                body = self.metrics()
+        labels = 'method="GET",route="recipes-list",status="2xx"'
+        self.assertIn(
+            f'foodgram_request_duration_seconds_count{{{labels}}} 2', body
+        )
+
+    def test_dead_worker_snapshots_are_dropped(self):
+        worker = subprocess.Popen(['true'])
+        worker.wait()
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS_DIR=directory):
+                self.anon_client.get('/api/recipes/')
+                registry.maybe_flush(force=True)
+                own = os.path.join(directory, f'{os.getpid()}.json')
+                dead = os.path.join(directory, f'{worker.pid}.json')
+                shutil.copy(own, dead)
+                body = self.metrics()
+                self.assertFalse(os.path.exists(dead))
+        labels = 'method="GET",route="recipes-list",status="2xx"'
+        self.assertIn(
+            f'foodgram_request_duration_seconds_count{{{labels}}} 1', body
+        )
+
+
+class CountersTest(QueryBudgetTestCase):
+
+    def test_counters_follow_api_changes(self):
+        self.assertCounters()
+        recipe = self.recipes[1]
+        client = APIClient()
+        client.force_authenticate(self.users[2])
+        client.post(f'/api/recipes/{recipe.id}/favorite/')
+        client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        client.post(f'/api/users/{self.users[3].id}/subscribe/')
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.shopping_cart_count, 1)
+        self.assertCounters()
+        client.delete(f'/api/recipes/{recipe.id}/favorite/')
+        client.delete(f'/api/users/{self.users[3].id}/subscribe/')
+        self.auth_client.delete(f'/api/recipes/{self.recipes[0].id}/')
+        self.assertCounters()
+        self.users[4].delete()
+        self.assertCounters()
+
+    FANS = 200
+
+    def add_fans(self, author, recipe):
+        """FANS пользователей подписаны на author, recipe у них в избранном
+        и в корзине."""
+        fans = CustomUser.objects.bulk_create(
+            CustomUser(username=f'fan{i}', email=f'fan{i}@example.com')
+            for i in range(self.FANS)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=fan, author=author) for fan in fans
+        )
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                model(user=fan, recipe=recipe) for fan in fans
+            )
+            model.objects.create(user=fans[0], recipe=self.recipes[0])
+        call_command('recount_counters', stdout=io.StringIO())
+        shopping_list.rebuild()
+        return fans
+
+    def test_recipe_deletion_does_not_touch_links_one_by_one(self):
+        recipe = self.recipes[3]
+        self.add_fans(recipe.author, recipe)
+        client = APIClient()
+        client.force_authenticate(recipe.author)
+        with CaptureQueriesContext(connection) as context:
+            response = client.delete(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertLessEqual(len(context), 20, '\n'.join(
+            query['sql'] for query in context.captured_queries
+        ))
+        self.assertCounters()
+        self.assertEqual(shopping_list.count_mismatches(), 0)
+
+    def test_author_deletion_does_not_touch_links_one_by_one(self):
+        author = self.users[1]
+        self.add_fans(author, self.recipes[3])
+        Favorite.objects.create(user=author, recipe=self.recipes[0])
+        ShoppingCart.objects.create(user=author, recipe=self.recipes[0])
+        Follow.objects.create(user=author, author=self.users[2])
+        call_command('recount_counters', stdout=io.StringIO())
+        with CaptureQueriesContext(connection) as context:
+            author.delete()
+        self.assertLessEqual(len(context), 40, '\n'.join(
+            query['sql'] for query in context.captured_queries
+        ))
+        self.assertCounters()
+        self.assertEqual(shopping_list.count_mismatches(), 0)
+        self.assertEqual(self.recipes[0].favorites.count(), 2)
+
+    def test_subscriptions_read_counter(self):
+        CustomUser.objects.filter(pk=self.users[1].pk).update(recipes_count=42)
+        response = self.auth_client.get('/api/users/subscriptions/?limit=1')
+        self.assertEqual(response.json()['results'][0]['recipes_count'], 42)
+
+    def test_recount_command(self):
+        Recipe.objects.update(favorites_count=100, shopping_cart_count=7)
+        CustomUser.objects.update(recipes_count=0, followers_count=5)
+        call_command('recount_counters', stdout=io.StringIO())
+        self.assertCounters()
+
+
+class RecipeSearchTest(QueryBudgetTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.chocolate = Ingredient.objects.create(
+            name='Шоколад горький', measurement_unit='г'
+        )
+        cls.by_name = Recipe.objects.create(
+            author=cls.users[1], name='Шоколадный торт', text='Испечь.',
+            cooking_time=60, image='recipes/cake.png'
+        )
+        cls.by_text = Recipe.objects.create(
+            author=cls.user, name='Кекс', cooking_time=40,
+            text='Растопить шоколад и смешать с мукой.',
+            image='recipes/muffin.png'
+        )
+        cls.by_ingredient = Recipe.objects.create(
+            author=cls.users[3], name='Глазурь', text='Смешать.',
+            cooking_time=5, image='recipes/glaze.png'
+        )
+        IngredientInRecipe.objects.create(
+            recipe=cls.by_ingredient, ingredient=cls.chocolate, amount=100
+        )
+        search.update_index()
+
+    def found(self, query):
+        response = self.anon_client.get('/api/recipes/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()['results']]
+
+    def found_by_cursor(self, query):
+        ids, path = [], '/api/recipes/?' + urlencode(
+            {'search': query, 'pagination': 'cursor', 'limit': 1}
+        )
+        while path:
+            response = self.anon_client.get(path)
+            self.assertEqual(response.status_code, 200, response.content)
+            ids.extend(item['id'] for item in response.json()['results'])
+            path = response.json()['next']
+        return ids
+
+    def test_ranked_over_name_ingredients_and_text(self):
+        self.assertEqual(
+            self.found('шоколад'),
+            [self.by_name.id, self.by_ingredient.id, self.by_text.id]
+        )
+        self.assertEqual(
+            self.found('ШОКОЛАД горький'), [self.by_ingredient.id]
+        )
+        self.assertEqual(self.found('несуществующее'), [])
+
+    def test_cursor_pages_keep_rank(self):
+        self.assertEqual(
+            self.found_by_cursor('шоколад'), self.found('шоколад')
+        )
+        self.assertEqual(
+            self.found_by_cursor('шоколад'),
+            [self.by_name.id, self.by_ingredient.id, self.by_text.id]
+        )
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.found('"шоколад* (торт:'), [self.by_name.id])
+        self.assertEqual(
+            len(self.found('  ')), min(6, Recipe.objects.count())
+        )
+
+    def test_search_combines_with_filters_and_budget(self):
+        Favorite.objects.create(user=self.user, recipe=self.by_text)
+        response = self.auth_client.get(
+            '/api/recipes/', {'search': 'шоколад', 'is_favorited': 1}
+        )
+        self.assertEqual(
+            [item['id'] for item in response.json()['results']],
+            [self.by_text.id]
+        )
+        self.assertPageBudget(
+            4, self.auth_client, '/api/recipes/?search=%D1%88%D0%BE%D0%BA'
+        )
+
+    def test_index_follows_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.auth_client.patch(
+                f'/api/recipes/{self.by_text.id}/',
+                {'text': 'Без сладкого.', 'ingredients': [
+                    {'id': self.chocolate.id, 'amount': 50}
+                ]},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.found('сладкого'), [self.by_text.id])
+        self.assertEqual(
+            self.found('горький'), [self.by_ingredient.id, self.by_text.id]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.auth_client.post('/api/recipes/', {
+                'name': 'Мусс', 'text': 'Взбить.', 'cooking_time': 20,
+                'image': make_base64_image(),
+                'ingredients': [{'id': self.chocolate.id, 'amount': 30}],
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertIn(response.json()['id'], self.found('мусс'))
+        self.by_name.delete()
+        self.assertEqual(self.found('торт'), [])
+
+    def test_index_follows_model_saves(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.by_name.name = 'Медовик'
+            self.by_name.save()
+        self.assertEqual(self.found('медовик'), [self.by_name.id])
+        self.assertEqual(self.found('торт'), [])
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.by_text.save(update_fields=['clicks'])
+        self.assertEqual(callbacks, [])
+
+    def test_index_follows_ingredient_rename(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.chocolate.name = 'Какао тертое'
+            self.chocolate.save()
+        self.assertEqual(self.found('какао'), [self.by_ingredient.id])
+        self.assertEqual(self.found('горький'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.chocolate.delete()
+        self.assertEqual(self.found('какао'), [])
+
+    def test_rebuild_command(self):
+        search.remove_from_index()
+        self.assertEqual(self.found('торт'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.found('торт'), [self.by_name.id])
+
+
+class RecipeMatchTest(QueryBudgetTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('мука', 'яйца', 'молоко', 'сахар')
+        )
+        cls.flour, cls.eggs, cls.milk, cls.sugar = ingredients
+        cls.pasta = cls.make_recipe('Паста', cls.flour, cls.eggs)
+        cls.pancakes = cls.make_recipe(
+            'Блины', cls.flour, cls.eggs, cls.milk
+        )
+        cls.cake = cls.make_recipe(
+            'Бисквит', cls.flour, cls.eggs, cls.milk, cls.sugar
+        )
+
+    @classmethod
+    def make_recipe(cls, name, *ingredients):
+        recipe = Recipe.objects.create(
+            author=cls.user, name=name, text='Описание', cooking_time=10,
+            image='recipes/match.png'
+        )
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients
+        )
+        return recipe
+
+    def matched(self, *ingredients, missing=None):
+        params = {'have': ','.join(str(item.id) for item in ingredients)}
+        if missing is not None:
+            params['missing'] = missing
+        response = self.anon_client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [item['id'] for item in response.json()['results']]
+
+    def test_ranked_by_missing_then_coverage(self):
+        self.assertEqual(self.matched(self.flour, self.eggs), [self.pasta.id])
+        self.assertEqual(
+            self.matched(self.flour, self.eggs, missing=1),
+            [self.pasta.id, self.pancakes.id]
+        )
+        self.assertEqual(
+            self.matched(self.flour, self.eggs, self.milk, missing=2),
+            [self.pancakes.id, self.pasta.id, self.cake.id]
+        )
+        self.assertEqual(self.matched(self.sugar), [])
+
+    def test_invalid_parameters(self):
+        for params in ({'have': 'мука'}, {'have': '1', 'missing': -1}):
+            response = self.anon_client.get('/api/recipes/', params)
+            self.assertEqual(response.status_code, 400)
+
+    def test_served_from_memory(self):
+        self.matched(self.flour)
+        _, plain = self.get_counted(self.anon_client, '/api/recipes/')
+        _, matched = self.get_counted(
+            self.anon_client,
+            f'/api/recipes/?have={self.flour.id},{self.eggs.id}&missing=3'
+        )
+        self.assertEqual(len(matched), len(plain))
+        self.assertPageBudget(
+            3, self.anon_client, f'/api/recipes/?have={self.flour.id}'
+        )
+
+    def test_updated_incrementally(self):
+        self.assertEqual(self.matched(self.flour, self.eggs), [self.pasta.id])
+        built_at = recipe_ingredient_index._built_at
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.auth_client.patch(
+                f'/api/recipes/{self.cake.id}/',
+                {'ingredients': [
+                    {'id': self.flour.id, 'amount': 1},
+                    {'id': self.eggs.id, 'amount': 2},
+                ]},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            self.matched(self.flour, self.eggs),
+            [self.cake.id, self.pasta.id]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.auth_client.delete(f'/api/recipes/{self.pasta.id}/')
+        self.assertEqual(self.matched(self.flour, self.eggs), [self.cake.id])
+        self.assertEqual(recipe_ingredient_index._built_at, built_at)
+
+    def test_cursor_pages_keep_rank(self):
+        ranked = self.matched(self.flour, self.eggs, self.milk, missing=2)
+        ids, path = [], (
+            f'/api/recipes/?have={self.flour.id},{self.eggs.id},'
+            f'{self.milk.id}&missing=2&pagination=cursor&limit=1'
+        )
+        while path:
+            response = self.anon_client.get(path)
+            self.assertEqual(response.status_code, 200, response.content)
+            ids.extend(item['id'] for item in response.json()['results'])
+            path = response.json()['next']
+        self.assertEqual(ids, ranked)
+
+    def test_stale_index_rebuilt_in_background(self):
+        self.assertEqual(self.matched(self.flour, self.eggs), [self.pasta.id])
+        index = recipe_ingredient_index
+        index._built_at -= settings.INGREDIENT_INDEX_MAX_AGE + 1
+        IngredientInRecipe.objects.create(
+            recipe=self.pasta, ingredient=self.sugar, amount=1
+        )
+        with mock.patch('recipes.catalog.threading.Thread') as thread:
+            with self.assertNumQueries(0):
+                for _ in range(2):
+                    self.assertEqual(
+                        index.match([self.flour.id, self.eggs.id]),
+                        [self.pasta.id]
+                    )
+        thread.assert_called_once()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.auth_client.delete(f'/api/recipes/{self.pancakes.id}/')
+        index._rebuild(*thread.call_args.kwargs['args'])
+        self.assertFalse(index._is_stale())
+        self.assertEqual(
+            index.match([self.flour.id, self.eggs.id], missing=2),
+            [self.pasta.id, self.cake.id]
+        )
+
+
+class ShoppingListTest(QueryBudgetTestCase):
+
+    def assertInSync(self):
+        self.assertEqual(shopping_list.count_mismatches(), 0)
+
+    def listed(self):
+        response = self.auth_client.get('/api/recipes/shopping_list/')
+        self.assertEqual(response.status_code, 200)
+        return {item['id']: item['amount'] for item in response.json()}
+
+    def test_endpoint_and_budget(self):
+        expected = {}
+        for row in IngredientInRecipe.objects.filter(
+            recipe__in_shopping_cart__user=self.user
+        ):
+            expected[row.ingredient_id] = (
+                expected.get(row.ingredient_id, 0) + row.amount
+            )
+        self.assertEqual(self.listed(), expected)
+        response = self.assertQueryBudget(
+            2, self.auth_client, '/api/recipes/shopping_list/'
+        )
+        self.assertEqual(
+            set(response.json()[0]),
+            {'id', 'name', 'measurement_unit', 'amount'}
+        )
+        self.assertQueryBudget(
+            2, self.auth_client, '/api/recipes/download_shopping_cart/'
+        )
+        self.assertEqual(self.anon_client.get(
+            '/api/recipes/shopping_list/'
+        ).status_code, 401)
+
+    def test_cart_changes_apply_deltas(self):
+        recipe = self.recipes[1]
+        before = self.listed()
+        self.auth_client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        after = self.listed()
+        for row in recipe.ingredientinrecipe_set.all():
+            self.assertEqual(
+                after[row.ingredient_id],
+                before.get(row.ingredient_id, 0) + row.amount
+            )
+        self.assertInSync()
+        self.auth_client.delete(f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.assertEqual(self.listed(), before)
+        self.assertInSync()
+
+    def test_repeated_removal_changes_list_once(self):
+        recipe = self.recipes[0]
+        before = self.listed()
+        for row in recipe.ingredientinrecipe_set.all():
+            before[row.ingredient_id] -= row.amount
+        for _ in range(2):
+            # Второй вызов - параллельный DELETE, прошедший проверку exists().
+            shopping_list.remove_from_cart(self.user, recipe)
+        self.assertEqual(self.listed(), {
+            ingredient_id: amount
+            for ingredient_id, amount in before.items() if amount
+        })
+        self.assertInSync()
+
+    def test_recipe_edits_reach_other_carts(self):
+        recipe = self.recipes[3]
+        ShoppingCart.objects.create(user=self.users[2], recipe=recipe)
+        shopping_list.rebuild()
+        author = APIClient()
+        author.force_authenticate(recipe.author)
+        response = author.patch(f'/api/recipes/{recipe.id}/', {
+            'ingredients': [
+                {'id': self.ingredients[0].id, 'amount': 40},
+                {'id': self.ingredients[-1].id, 'amount': 2},
+            ]
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertInSync()
+        response = author.delete(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertInSync()
+
+    def test_rebuild_command(self):
+        ShoppingListItem.objects.filter(user=self.user).first().delete()
+        ShoppingListItem.objects.filter(user=self.user).update(total_amount=1)
+        with self.assertRaises(CommandError):
+            call_command(
+                'rebuild_shopping_lists', '--check', stdout=io.StringIO()
+            )
+        out = io.StringIO()
+        call_command('rebuild_shopping_lists', stdout=out)
+        self.assertIn('исправлено', out.getvalue())
+        self.assertInSync()
+        call_command(
+            'rebuild_shopping_lists', '--check', stdout=io.StringIO()
+        )
+
+
+class BatchEndpointsTest(QueryBudgetTestCase):
+
+    def post(self, path, ids, method='post'):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.auth_client, method)(
+                path, {'ids': ids}, format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        return {
+            item['id']: (item['status'], item.get('errors'))
+            for item in response.json()['results']
+        }, len(context)
+
+    def test_shopping_cart_batch(self):
+        path = '/api/recipes/shopping_cart/'
+        in_cart, fresh = self.recipes[0].id, self.recipes[1].id
+        results, _ = self.post(path, [fresh, in_cart, 10 ** 6, fresh])
+        self.assertEqual(results, {
+            fresh: (201, None),
+            in_cart: (400, 'Рецепт уже в списке покупок'),
+            10 ** 6: (404, 'Рецепт не найден'),
+        })
+        self.assertCounters()
+        self.assertEqual(shopping_list.count_mismatches(), 0)
+        results, _ = self.post(path, [fresh, self.recipes[2].id], 'delete')
+        self.assertEqual(results, {
+            fresh: (204, None),
+            self.recipes[2].id: (400, 'Рецепт не в списке покупок'),
+        })
+        self.assertFalse(ShoppingCart.objects.filter(
+            user=self.user, recipe_id=fresh
+        ).exists())
+        self.assertCounters()
+        self.assertEqual(shopping_list.count_mismatches(), 0)
+
+    def test_links_created_concurrently_are_not_counted(self):
+        racing, fresh = self.recipes[1], self.recipes[2]
+        stale = batch.linked
+
+        def linked(*args):
+            existing = stale(*args)
+            if not racing.in_shopping_cart.filter(user=self.user).exists():
+                shopping_list.add_to_cart(self.user, racing)
+            return existing
+
+        with mock.patch.object(batch, 'linked', side_effect=linked):
+            results, _ = self.post(
+                '/api/recipes/shopping_cart/', [racing.id, fresh.id]
+            )
+        self.assertEqual(results, {
+            racing.id: (400, 'Рецепт уже в списке покупок'),
+            fresh.id: (201, None),
+        })
+        self.assertCounters()
+        self.assertEqual(shopping_list.count_mismatches(), 0)
+
+    def test_favorite_batch_query_count_is_constant(self):
+        path = '/api/recipes/favorite/'
+        self.post(path, [self.recipes[1].id])
+        ids = [recipe.id for recipe in self.recipes[3::2]]
+        _, few = self.post(path, ids[:2])
+        results, many = self.post(path, ids[2:])
+        self.assertEqual(few, many)
+        self.assertEqual({code for code, _ in results.values()}, {201})
+        _, few = self.post(path, ids[:2], 'delete')
+        _, many = self.post(path, ids[2:], 'delete')
+        self.assertEqual(few, many)
+        self.assertCounters()
+
+    def test_invalid_payload(self):
+        for payload in ({}, {'ids': []}, {'ids': ['a']}, {'ids': [0]},
+                        {'ids': list(range(1, settings.BATCH_MAX_ITEMS + 2))}):
+            response = self.auth_client.post(
+                '/api/recipes/favorite/', payload, format='json'
+            )
+            self.assertEqual(response.status_code, 400, payload)
+        self.assertEqual(self.anon_client.post(
+            '/api/recipes/favorite/', {'ids': [1]}, format='json'
+        ).status_code, 401)
+
+
+class FeedTest(QueryBudgetTestCase):
+    path = '/api/recipes/feed/?limit=4'
+
+    def walk(self, client=None):
+        client = client or self.auth_client
+        ids, path = [], self.path
+        while path:
+            response = self.assertQueryBudget(5, client, path)
+            ids.extend(item['id'] for item in response.json()['results'])
+            path = response.json()['next']
+        return ids
+
+    def expected(self, user=None):
+        return list(Recipe.objects.filter(
+            author__following__user=user or self.user
+        ).values_list('id', flat=True))
+
+    def test_fan_in_feed(self):
+        Follow.objects.filter(user=self.user, author=self.users[1]).delete()
+        ids = self.walk()
+        self.assertEqual(ids, self.expected())
+        self.assertEqual(
+            len(ids), (self.USERS - 2) * self.RECIPES_PER_USER
+        )
+        self.assertEqual(
+            self.anon_client.get('/api/recipes/feed/').status_code, 401
+        )
+
+    def test_timeline_feed(self):
+        call_command(
+            'build_timelines', '--threshold', self.USERS - 1,
+            stdout=io.StringIO()
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(),
+            len(self.expected())
+        )
+        self.assertEqual(self.walk(), self.expected())
+        author = APIClient()
+        author.force_authenticate(self.users[2])
+        response = author.post('/api/recipes/', {
+            'name': 'Свежий', 'text': 'Текст', 'cooking_time': 5,
+            'image': make_base64_image(),
+            'ingredients': [{'id': self.ingredients[0].id, 'amount': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        feed = self.walk()
+        self.assertEqual(feed[0], response.json()['id'])
+        self.auth_client.delete(f'/api/users/{self.users[3].id}/subscribe/')
+        self.auth_client.delete(
+            '/api/users/subscribe/', {'ids': [self.users[4].id]}, format='json'
+        )
+        self.assertEqual(self.walk(), self.expected())
+        self.auth_client.post(
+            '/api/users/subscribe/', {'ids': [self.users[4].id]}, format='json'
+        )
+        self.assertEqual(self.walk(), self.expected())
+        call_command(
+            'build_timelines', '--user', self.user.username, '--drop',
+            stdout=io.StringIO()
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+        self.assertEqual(self.walk(), self.expected())
+
+    def test_deleted_users_leave_timelines(self):
+        call_command(
+            'build_timelines', '--threshold', self.USERS - 1,
+            stdout=io.StringIO()
+        )
+        author_id = self.users[3].id
+        self.assertTrue(
+            TimelineEntry.objects.filter(recipe__author_id=author_id).exists()
+        )
+        self.users[3].delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(recipe__author_id=author_id).exists()
+        )
+        self.assertEqual(self.walk(), self.expected())
+        self.user.delete()
+        self.assertFalse(TimelineEntry.objects.exists())
+
+
+@override_settings(TOKEN_CACHE_ALIAS='default')
+class ConditionalGetTest(QueryBudgetTestCase):
+
+    def revalidate(self, client, path, response, queries=None):
+        headers = {'HTTP_IF_NONE_MATCH': response['ETag']}
+        with CaptureQueriesContext(connection) as context:
+            again = client.get(path, **headers)
+        if queries is not None and again.status_code == 304:
+            self.assertEqual(len(context), queries)
+        return again
+
+    def test_recipe_detail(self):
+        recipe = self.recipes[3]
+        path = f'/api/recipes/{recipe.id}/'
+        response = self.auth_client.get(path)
+        self.assertIn('Authorization', response['Vary'])
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(
+            self.revalidate(self.auth_client, path, response, 1).status_code,
+            304
+        )
+        anonymous = self.anon_client.get(path)
+        self.assertNotEqual(anonymous['ETag'], response['ETag'])
+        self.auth_client.post(f'/api/recipes/{recipe.id}/favorite/')
+        # Избранное не меняет updated_at: по одной дате ответили бы 304.
+        self.assertEqual(self.auth_client.get(
+            path, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        ).status_code, 200)
+        response = self.revalidate(self.auth_client, path, response)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_favorited'])
+        ingredient = recipe.ingredientinrecipe_set.first().ingredient
+        ingredient.name = 'переименован'
+        ingredient.save()
+        response = self.revalidate(self.auth_client, path, response)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.anon_client.get('/api/recipes/0/').status_code, 404
+        )
+
+    def test_ingredients(self):
+        path = '/api/ingredients/'
+        response = self.anon_client.get(path)
+        self.assertEqual(
+            self.revalidate(self.anon_client, path, response, 0).status_code,
+            304
+        )
+        searched = self.anon_client.get(path, {'name': 'ингр'})
+        self.assertNotEqual(searched['ETag'], response['ETag'])
+        Ingredient.objects.create(name='новый', measurement_unit='шт')
+        self.assertEqual(
+            self.revalidate(self.anon_client, path, response).status_code, 200
+        )
+        path = f'/api/ingredients/{self.ingredients[0].id}/'
+        response = self.anon_client.get(path)
+        self.assertEqual(
+            self.revalidate(self.anon_client, path, response, 1).status_code,
+            304
+        )
+
+
+class CatalogSnapshotTest(QueryBudgetTestCase):
+    path = '/api/ingredients/snapshot/'
+
+    def test_encodings_match_catalog(self):
+        catalog = self.anon_client.get('/api/ingredients/').json()
+        for accept, encoding, decode in (
+            ('gzip, deflate, br', 'br', brotli.decompress),
+            ('gzip', 'gzip', gzip.decompress),
+            ('identity', None, bytes),
+        ):
+            response = self.anon_client.get(
+                self.path, HTTP_ACCEPT_ENCODING=accept
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get('Content-Encoding'), encoding)
+            self.assertIn('Accept-Encoding', response['Vary'])
+            self.assertEqual(json.loads(decode(response.content)), catalog)
+
+    def test_q_values_are_honoured(self):
+        snapshot = ingredient_index.snapshot()
+        for accept, encoding in (
+            ('br;q=0, gzip', 'gzip'),
+            ('gzip;q=1.0, br;q=0.5', 'gzip'),
+            ('BR;Q=0.8, gzip;q=0.8', 'br'),
+            ('*;q=0.5, br;q=0', 'gzip'),
+            ('gzip;q=0, br;q=0', None),
+            ('br;q=0.2, identity', None),
+            ('x-brotli, gzip;q=0', None),
+            ('', None),
+        ):
+            self.assertEqual(snapshot.negotiate(accept), encoding, accept)
+        response = self.anon_client.get(
+            self.path, HTTP_ACCEPT_ENCODING='br;q=0, gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_versioned_and_conditional(self):
+        response = self.anon_client.get(self.path, HTTP_ACCEPT_ENCODING='br')
+        self.assertIn('max-age=300', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            again = self.anon_client.get(
+                self.path, HTTP_ACCEPT_ENCODING='br',
+                HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(again.status_code, 304)
+        versioned = self.anon_client.get(response['Content-Location'])
+        self.assertIn('immutable', versioned['Cache-Control'])
+        self.assertIn('max-age=31536000', versioned['Cache-Control'])
+
+    def test_regenerated_on_catalog_change(self):
+        before = self.anon_client.get(self.path)
+        Ingredient.objects.create(name='новинка', measurement_unit='шт')
+        after = self.anon_client.get(self.path)
+        self.assertNotEqual(before['ETag'], after['ETag'])
+        self.assertIn('новинка', after.content.decode())
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', encoding='utf-8'
+        ) as file:
+            file.write('загружено,г\n')
+            file.flush()
+            call_command('load_ingredients', file.name, stdout=io.StringIO())
+        response = self.anon_client.get(self.path)
+        self.assertIn('загружено', response.content.decode())
+
+
+class ShortLinkTest(QueryBudgetTestCase):
+
+    def tearDown(self):
+        click_buffer.flush()
+
+    def test_codes_are_unique_and_exposed(self):
+        codes = set(Recipe.objects.values_list('short_code', flat=True))
+        self.assertEqual(len(codes), len(self.recipes))
+        recipe = self.recipes[0]
+        response = self.anon_client.get(f'/api/recipes/{recipe.id}/get-link/')
+        self.assertTrue(
+            response.json()['short-link'].endswith(f'/s/{recipe.short_code}/')
+        )
+
+    def test_redirect_is_cached(self):
+        recipe = self.recipes[0]
+        response = self.anon_client.get(f'/s/{recipe.short_code}/')
+        self.assertRedirects(
+            response, f'/recipes/{recipe.id}/', fetch_redirect_response=False
+        )
+        with self.assertNumQueries(0):
+            self.anon_client.get(f'/s/{recipe.short_code}/')
+        self.assertEqual(self.anon_client.get('/s/unknown1/').status_code, 404)
+        with self.assertNumQueries(0):
+            response = self.anon_client.get('/s/unknown1/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_legacy_numeric_links(self):
+        recipe = self.recipes[1]
+        response = self.anon_client.get(f'/s/{recipe.id}/')
+        self.assertRedirects(
+            response, f'/recipes/{recipe.id}/', fetch_redirect_response=False
+        )
+
+    def test_new_and_deleted_recipes(self):
+        recipe = self.recipes[2]
+        self.anon_client.get(f'/s/{recipe.short_code}/')
+        self.auth_client.delete(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(
+            self.anon_client.get(f'/s/{recipe.short_code}/').status_code, 404
+        )
+        created = Recipe.objects.create(
+            author=self.user, name='Новый', text='Текст', cooking_time=1,
+            image='recipes/new.png'
+        )
+        with self.assertNumQueries(0):
+            response = self.anon_client.get(f'/s/{created.short_code}/')
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(SHORT_LINK_FLUSH_SIZE=5, SHORT_LINK_FLUSH_INTERVAL=3600)
+    def test_clicks_flushed_in_batches(self):
+        click_buffer.flush()
+        first, second = self.recipes[0], self.recipes[1]
+        for code in [first.short_code] * 3:
+            self.anon_client.get(f'/s/{code}/')
+        with CaptureQueriesContext(connection) as context:
+            self.anon_client.get(f'/s/{second.short_code}/')
+            self.anon_client.get(f'/s/{first.short_code}/')
+        self.assertEqual(
+            sum(query['sql'].startswith('UPDATE') for query
+                in context.captured_queries), 2
+        )
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.clicks, second.clicks), (4, 1))
+
+
+class ReplicaRoutingTest(QueryBudgetTestCase):
+    """
+    В тестах одна база, поэтому реплика подменяется, а решения роутера
+    записываются: сами запросы все равно идут в default.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.routed = []
+        route = db_routers.ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            self.routed.append(route(router, model, **hints))
+
+        patches = [
+            mock.patch.object(db_routers.ReplicaRouter, 'db_for_read', spy),
+            mock.patch.object(
+                db_routers, 'replica_alias', return_value='replica'
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def reads(self, client, path):
+        self.routed.clear()
+        response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return set(self.routed)
+
+    def test_safe_reads_use_replica(self):
+        for path in (
+            '/api/recipes/', f'/api/recipes/{self.recipes[0].id}/',
+            '/api/ingredients/', f'/api/users/{self.users[1].id}/',
+        ):
+            self.assertIn('replica', self.reads(self.auth_client, path), path)
+        self.assertEqual(self.reads(self.anon_client, '/api/recipes/'), {
+            'replica'
+        })
+
+    def test_write_pins_client_to_primary(self):
+        recipe = self.recipes[1]
+        response = self.auth_client.post(
+            f'/api/recipes/{recipe.id}/favorite/'
+        )
+        self.assertEqual(response.status_code, 201)
+        cache.clear()
+        self.assertNotIn(
+            'replica', self.reads(self.auth_client, '/api/recipes/')
+        )
+        self.assertIn('replica', self.reads(self.anon_client, '/api/recipes/'))
+        self.auth_client.cookies[settings.REPLICA_PIN_COOKIE] = 'forged'
+        self.assertIn('replica', self.reads(self.auth_client, '/api/recipes/'))
+
+    def test_pin_expires(self):
+        self.auth_client.post(f'/api/recipes/{self.recipes[1].id}/favorite/')
+        later = time.time() + settings.REPLICA_PIN_SECONDS + 1
+        with mock.patch('django.core.signing.time') as clock:
+            clock.time.return_value = later
+            reads = self.reads(self.auth_client, '/api/recipes/')
+        self.assertIn('replica', reads)
+
+    def test_failed_write_does_not_pin(self):
+        response = self.auth_client.post(
+            '/api/recipes/', {'name': ''}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('replica', self.reads(self.auth_client, '/api/recipes/'))
+
+    def test_reads_outside_views_use_primary(self):
+        self.reads(self.anon_client, '/api/recipes/')
+        self.assertIsNone(db_routers.ReplicaRouter().db_for_read(Recipe))
+        self.routed.clear()
+        self.anon_client.get(f'/s/{self.recipes[0].short_code}/')
+        click_buffer.flush()
+        self.assertEqual(set(self.routed), {None})
+
+
+class AsyncEndpointsTest(QueryBudgetTestCase):
+    """Async-представления ASGI-режима отвечают так же, как вьюсеты DRF."""
+
+    ASYNC_URLCONF = 'foodgram.urls_async'
+
+    def async_request(self, method, path, token=None, **kwargs):
+        headers = kwargs.pop('headers', {})
+        if token:
+            headers['Authorization'] = f'Token {token}'
+
+        async def request():
+            return await getattr(AsyncClient(), method)(
+                path, headers=headers, **kwargs
+            )
+
+        with override_settings(ROOT_URLCONF=self.ASYNC_URLCONF):
+            return async_to_sync(request)()
+
+    def assertSameResponse(self, sync_response, async_response):
+        self.assertEqual(sync_response.status_code, async_response.status_code)
+        self.assertEqual(sync_response.content, async_response.content)
+        for header in ('Content-Type', 'ETag', 'WWW-Authenticate'):
+            self.assertEqual(
+                sync_response.get(header), async_response.get(header), header
+            )
+
+    def test_hot_endpoints_are_coroutines(self):
+        for path in (
+            '/api/recipes/1/', '/api/recipes/1/favorite/',
+            '/api/recipes/1/shopping_cart/', '/api/ingredients/',
+            '/api/users/1/subscribe/',
+        ):
+            match = resolve(path, urlconf=self.ASYNC_URLCONF)
+            self.assertTrue(asyncio.iscoroutinefunction(match.func), path)
+            self.assertEqual(match.view_name, resolve(path).view_name)
+
+    def test_reads_match_sync(self):
+        recipe = self.recipes[3]
+        for path in (
+            f'/api/recipes/{recipe.id}/', '/api/recipes/999999/',
+            '/api/ingredients/', '/api/ingredients/?name=ингредиент 1',
+        ):
+            self.assertSameResponse(
+                self.anon_client.get(path), self.async_request('get', path)
+            )
+            self.assertSameResponse(
+                self.auth_client.get(path),
+                self.async_request('get', path, self.token.key)
+            )
+        self.assertSameResponse(
+            self.anon_client.get(
+                '/api/ingredients/', HTTP_AUTHORIZATION='Token wrong'
+            ),
+            self.async_request('get', '/api/ingredients/', 'wrong')
+        )
+
+    def test_conditional_detail(self):
+        path = f'/api/recipes/{self.recipes[0].id}/'
+        etag = self.async_request('get', path, self.token.key)['ETag']
+        response = self.async_request(
+            'get', path, self.token.key, headers={'If-None-Match': etag}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def toggle_pair(self, path, **kwargs):
+        """POST, повторный POST, DELETE и повторный DELETE по одному пути."""
+        return [
+            self.async_request(method, path, self.token.key, **kwargs)
+            for method in ('post', 'post', 'delete', 'delete')
+        ]
+
+    def test_toggles_match_sync(self):
+        recipe = self.recipes[1]
+        for action in ('favorite', 'shopping_cart'):
+            path = f'/api/recipes/{recipe.id}/{action}/'
+            async_responses = self.toggle_pair(path)
+            sync_responses = [
+                getattr(self.auth_client, method)(path)
+                for method in ('post', 'post', 'delete', 'delete')
+            ]
+            for sync_response, async_response in zip(
+                sync_responses, async_responses
+            ):
+                self.assertSameResponse(sync_response, async_response)
+        self.assertSameResponse(
+            self.anon_client.post(f'/api/recipes/{recipe.id}/favorite/'),
+            self.async_request('post', f'/api/recipes/{recipe.id}/favorite/')
+        )
+        self.assertSameResponse(
+            self.auth_client.post('/api/recipes/999999/favorite/'),
+            self.async_request(
+                'post', '/api/recipes/999999/favorite/', self.token.key
+            )
+        )
+        self.assertCounters()
+
+    def test_cart_updates_shopping_list(self):
+        recipe = self.recipes[1]
+        path = f'/api/recipes/{recipe.id}/shopping_cart/'
+        self.async_request('post', path, self.token.key)
+        self.assertEqual(
+            shopping_list.count_mismatches(), 0
+        )
+        self.async_request('delete', path, self.token.key)
+        self.assertEqual(shopping_list.count_mismatches(), 0)
+
+    def test_subscribe_matches_sync(self):
+        delete_links(
+            Follow.objects.filter(user=self.user), 'author', 'followers_count'
+        )
+        author = self.users[2]
+        path = f'/api/users/{author.id}/subscribe/?recipes_limit=2'
+        async_responses = self.toggle_pair(path)
+        sync_responses = [
+            getattr(self.auth_client, method)(path)
+            for method in ('post', 'post', 'delete', 'delete')
+        ]
+        for sync_response, async_response in zip(
+            sync_responses, async_responses
+        ):
+            self.assertSameResponse(sync_response, async_response)
+        self.assertEqual(len(async_responses[0].json()['recipes']), 2)
+        self.assertCounters()
+
+    def test_async_unfollow_updates_timeline(self):
+        author = self.users[2]
+        Follow.objects.get_or_create(user=self.user, author=author)
+        feed.build_timeline(self.user.id)
+        entries = feed.timeline_entries(self.user).filter(
+            recipe__author=author
+        )
+        self.assertTrue(entries.exists())
+        response = self.async_request(
+            'delete', f'/api/users/{author.id}/subscribe/', self.token.key
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(entries.exists())
+        self.assertCounters()
+
+    def test_repeated_async_delete_counts_once(self):
+        recipe = self.recipes[1]
+        Favorite.objects.create(user=self.user, recipe=recipe)
+        links = Favorite.objects.filter(user=self.user, recipe=recipe)
+
+        async def delete_twice():
+            return await asyncio.gather(
+                adelete_links(links, 'recipe', 'favorites_count'),
+                adelete_links(links, 'recipe', 'favorites_count'),
+            )
+
+        self.assertCountEqual(
+            async_to_sync(delete_twice)(), [[recipe.id], []]
+        )
+        self.assertCounters()
+
+    def test_other_methods_use_sync_views(self):
+        recipe = self.recipes[0]
+        response = self.async_request(
+            'delete', f'/api/recipes/{recipe.id}/', self.token.key
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Recipe.objects.filter(id=recipe.id).exists())
+        self.assertEqual(
+            self.async_request(
+                'get', f'/api/recipes/{recipe.id}/favorite/', self.token.key
+            ).status_code, 405
+        )
+
+
+class FastSerializersContractTest(QueryBudgetTestCase):
+    """Быстрый путь списка рецептов и orjson дают те же байты, что DRF."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        author = CustomUser.objects.create_user(
+            username='noavatar', email='noavatar@example.com',
+            first_name='Без', last_name='Аватара', password='password12345'
+        )
+        cls.recipes.append(Recipe.objects.create(
+            author=author, name='Пустой "рецепт"',
+            text='Строка\u2028разделитель\u2029и \\ слеш',
+            cooking_time=1, image='recipes/empty.png'
+        ))
+
+    def serializer_recipes(self, rows, request):
+        ids = [row['id'] for row in rows]
+        by_id = Recipe.objects.with_related().with_user_flags(
+            request.user
+        ).in_bulk(ids)
+        return RecipeSerializer(
+            [by_id[pk] for pk in ids], many=True, context={'request': request}
+        ).data
+
+    def test_rows_match_serializer(self):
+        factory = RequestFactory()
+        for user in (AnonymousUser(), self.user, self.users[1]):
+            request = factory.get('/api/recipes/')
+            request.user = user
+            queryset = Recipe.objects.with_related().with_user_flags(user)
+            self.assertEqual(
+                ORJSONRenderer().render(fast_serializers.recipes(
+                    fast_serializers.recipe_rows(queryset), request
+                )),
+                JSONRenderer().render(RecipeSerializer(
+                    queryset, many=True, context={'request': request}
+                ).data)
+            )
+
+    def test_list_matches_serializer(self):
+        ingredient = self.ingredients[3].id
+        for path in (
+            '/api/recipes/', '/api/recipes/?limit=100',
+            '/api/recipes/?limit=4&offset=8',
+            '/api/recipes/?pagination=cursor&limit=5',
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=1',
+            f'/api/recipes/?author={self.users[2].id}',
+            '/api/recipes/?search=рецепт', f'/api/recipes/?have={ingredient}',
+        ):
+            for client in (self.anon_client, self.auth_client):
+                fast = client.get(path)
+                with mock.patch.object(
+                    fast_serializers, 'recipes', self.serializer_recipes
+                ):
+                    slow = client.get(path)
+                self.assertEqual(fast.status_code, 200, path)
+                self.assertEqual(fast.content, slow.content, path)
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            'created': datetime.datetime(
+                2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc
+            ),
+            'naive': datetime.datetime(2024, 5, 1, 12, 30),
+            'date': datetime.date(2024, 5, 1),
+            'time': datetime.time(7, 5, 3, 250000),
+            'amount': decimal.Decimal('12.50'),
+            'lazy': gettext_lazy('Ошибка'),
+            'detail': ErrorDetail('Не найдено', code='not_found'),
+            'unicode': 'Щи «с \u2028 и \u2029» \\ "кавычки" \n',
+            1: [None, True, False, 0, -7, 1.5, 'x'],
+            'nested': ReturnDict(
+                {'a': ReturnList([{}], serializer=None)}, serializer=None
+            ),
+        }
+        self.assertEqual(
+            ORJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+        self.assertEqual(
+            ORJSONRenderer().render(
+                data, 'application/json; indent=4', {}
+            ),
+            JSONRenderer().render(data, 'application/json; indent=4', {})
+        )
+
+    def test_parser(self):
+        self.assertEqual(
+            ORJSONParser().parse(io.BytesIO('{"имя": [1, 2.5]}'.encode())),
+            {'имя': [1, 2.5]}
+        )
+        response = self.auth_client.post(
+            '/api/recipes/', '{"name": ', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['detail'])
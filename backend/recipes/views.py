@@ -3,22 +3,66 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404, redirect
-from django.db.models import Sum
-from django.http import HttpResponse, Http404
-from .models import Recipe, Ingredient, IngredientInRecipe, Favorite, ShoppingCart
-from .serializers import RecipeSerializer, RecipeCreateSerializer, RecipeMinifiedSerializer, IngredientSerializer
+from django.db import transaction
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+    quote_etag
+)
+from .models import (
+    Recipe, Ingredient, Favorite, ShoppingCart, ShoppingListItem
+)
+from .serializers import (
+    RecipeSerializer, RecipeCreateSerializer, RecipeMinifiedSerializer,
+    IngredientSerializer, ShoppingListItemSerializer
+)
+from . import batch, fast_serializers, feed, shopping_list, short_links
+from .counters import delete_links, increment
 from .filters import RecipeFilter
+from .catalog import ingredient_index
+from .exports import EXPORT_FORMATS, shopping_list_rows
 from .permissions import IsAuthorOrReadOnly
 from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
-import traceback
+from django.db.models import Max
+from foodgram.conditional import ConditionalGetMixin
+from foodgram.db_routers import ReplicaReadMixin
+from foodgram.pagination import FeedPagination, RecipePagination
+import itertools
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+def recipe_version(recipe):
+    """Версия для ETag по рецепту из with_related().with_user_flags()."""
+    return (
+        recipe.updated_at, recipe.author.updated_at,
+        max((row.ingredient.updated_at
+             for row in recipe.ingredientinrecipe_set.all()), default=None),
+        recipe.is_favorited, recipe.is_in_shopping_cart,
+        recipe.author_is_subscribed
+    )
+
+
+def recipe_versions(pk, user):
+    """Строка версии рецепта одним запросом, без загрузки самого рецепта."""
+    return Recipe.objects.filter(pk=pk).with_user_flags(user).annotate(
+        ingredients_updated_at=Max(
+            'ingredientinrecipe__ingredient__updated_at'
+        )
+    ).values_list(
+        'updated_at', 'author__updated_at', 'ingredients_updated_at',
+        'is_favorited', 'is_in_shopping_cart', 'author_is_subscribed'
+    ).order_by()
+
+
+class RecipeViewSet(
+    ReplicaReadMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthorOrReadOnly]
     filterset_class = RecipeFilter
     filter_backends = [DjangoFilterBackend]
+    pagination_class = RecipePagination
 
     def get_permissions(self):
         if self.action in ['create', 'favorite', 'shopping_cart']:
@@ -27,16 +71,44 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return [IsAuthenticated(), IsAuthorOrReadOnly()]
         return super().get_permissions()
 
+    def get_queryset(self):
+        return super().get_queryset().with_related().with_user_flags(
+            self.request.user
+        )
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        shopping_list.recipe_deleted([instance.id])
+        instance.delete()
+
+    def get_version(self, obj=None):
+        if obj is not None:
+            return recipe_version(obj)
+        if str(self.kwargs['pk']).isdigit():
+            return recipe_versions(
+                self.kwargs['pk'], self.request.user
+            ).first()
+        return None
+
+    def list(self, request, *args, **kwargs):
+        rows = fast_serializers.recipe_rows(
+            self.filter_queryset(self.get_queryset())
+        )
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(fast_serializers.recipes(rows, request))
+        return self.get_paginated_response(
+            fast_serializers.recipes(page, request)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return RecipeCreateSerializer
         return RecipeSerializer
 
-    def update(self, request, *args, **kwargs):
-        print(f"Requested recipe ID: {kwargs.get('pk')}")
-        print(f"Available recipes: {list(Recipe.objects.values_list('id', flat=True))}")
-        return super().update(request, *args, **kwargs)
-
     @action(
         methods=['post', 'delete'],
         detail=True,
@@ -63,7 +135,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 {'errors': 'Рецепт не в избранном'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        Favorite.objects.filter(user=request.user, recipe=recipe).delete()
+        delete_links(
+            Favorite.objects.filter(user=request.user, recipe=recipe),
+            'recipe', 'favorites_count'
+        )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -75,27 +150,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_link(self, request, pk=None):
         try:
             recipe = get_object_or_404(Recipe, id=pk)
-            print(f"Recipe found: {recipe.id}, {recipe.name}")
-            short_link = request.build_absolute_uri(
-                reverse('recipe-short-link', kwargs={'recipe_id': recipe.id})
-            )
-            print(f"Generated short link: {short_link}")
-            return Response(
-                {'short-link': short_link},
-                status=status.HTTP_200_OK
-            )
         except Http404:
-            print(f"Recipe with ID {pk} not found")
             return Response(
                 {"detail": "Рецепт не найден"},
                 status=status.HTTP_404_NOT_FOUND
             )
-        except Exception as e:
-            print(f"Error in get_link: {str(e)}")
-            return Response(
-                {"detail": "Ошибка при генерации ссылки"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        short_link = request.build_absolute_uri(
+            reverse('recipe-short-link', kwargs={'code': recipe.short_code})
+        )
+        return Response(
+            {'short-link': short_link},
+            status=status.HTTP_200_OK
+        )
 
     @action(
         methods=['post', 'delete'],
@@ -115,7 +181,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
                     {'errors': 'Рецепт уже в списке покупок'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            ShoppingCart.objects.create(user=request.user, recipe=recipe)
+            shopping_list.add_to_cart(request.user, recipe)
             serializer = RecipeMinifiedSerializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         if not ShoppingCart.objects.filter(user=request.user, recipe=recipe).exists():
@@ -123,79 +189,226 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 {'errors': 'Рецепт не в списке покупок'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        ShoppingCart.objects.filter(user=request.user, recipe=recipe).delete()
+        shopping_list.remove_from_cart(request.user, recipe)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
-        methods=['get'],
+        methods=['post', 'delete'],
         detail=False,
+        url_path='favorite',
+        url_name='favorite-batch',
         permission_classes=[IsAuthenticated]
     )
-    def download_shopping_cart(self, request):
-        try:
-            print(f"User: {request.user}")
-            ingredients = IngredientInRecipe.objects.filter(
-                recipe__in_shopping_cart__user=request.user
-            ).values(
-                'ingredient__name', 'ingredient__measurement_unit'
-            ).annotate(
-                total_amount=Sum('amount')
-            )
-            print(f"Ingredients: {list(ingredients)}")
+    def favorite_batch(self, request):
+        return self.batch(
+            request, Favorite, 'favorites_count',
+            'Рецепт уже в избранном', 'Рецепт не в избранном'
+        )
 
-            if not ingredients:
-                return Response(
-                    {"detail": "Список покупок пуст."},
-                    status=status.HTTP_200_OK,
-                    content_type='application/json'
-                )
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='shopping_cart',
+        url_name='shopping-cart-batch',
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_batch(self, request):
+        return self.batch(
+            request, ShoppingCart, 'shopping_cart_count',
+            'Рецепт уже в списке покупок', 'Рецепт не в списке покупок'
+        )
 
-            content = "Список покупок\n\n"
-            for item in ingredients:
-                content += (
-                    f"{item['ingredient__name']} - "
-                    f"{item['total_amount']} {item['ingredient__measurement_unit']}\n"
+    def batch(self, request, model, counter, exists_error, missing_error):
+        serializer = batch.BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        user = request.user
+        with transaction.atomic():
+            if request.method == 'POST':
+                found = set(Recipe.objects.select_for_update().filter(
+                    id__in=ids
+                ).order_by('id').values_list('id', flat=True))
+                changed = batch.link(
+                    user, model, 'recipe', [pk for pk in ids if pk in found]
                 )
+                increment(Recipe.objects.filter(id__in=changed), counter, 1)
+                sign, code, error = 1, status.HTTP_201_CREATED, exists_error
+            else:
+                found = set(ids)
+                changed = batch.unlink(user, model, 'recipe', counter, ids)
+                sign, code = -1, status.HTTP_204_NO_CONTENT
+                error = missing_error
+            if model is ShoppingCart:
+                shopping_list.cart_changed(
+                    [(user.id, recipe_id) for recipe_id in changed], sign
+                )
+        results = []
+        for pk in ids:
+            if pk in changed:
+                results.append(batch.result(pk, code))
+            elif pk not in found:
+                results.append(batch.result(
+                    pk, status.HTTP_404_NOT_FOUND, 'Рецепт не найден'
+                ))
+            else:
+                results.append(batch.result(
+                    pk, status.HTTP_400_BAD_REQUEST, error
+                ))
+        return Response({'results': results})
 
-            response = HttpResponse(
-                content_type='text/plain; charset=utf-8',
-                content=content.encode('utf-8')
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=[IsAuthenticated]
+    )
+    def feed(self, request):
+        paginator = FeedPagination()
+        recipes = self.get_queryset()
+        if feed.has_timeline(request.user.id):
+            paginator.ordering = ('-created_at', '-recipe_id')
+            entries = paginator.paginate_queryset(
+                feed.timeline_entries(request.user), request, self
             )
-            response['Content-Disposition'] = (
-                'attachment; filename="shopping_cart.txt"'
+            by_id = recipes.in_bulk([entry.recipe_id for entry in entries])
+            page = [
+                by_id[entry.recipe_id] for entry in entries
+                if entry.recipe_id in by_id
+            ]
+        else:
+            page = paginator.paginate_queryset(
+                feed.fan_in(recipes, request.user), request, self
             )
-            return response
+        serializer = RecipeSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_list(self, request):
+        items = ShoppingListItem.objects.filter(
+            user=request.user
+        ).select_related('ingredient').order_by('ingredient__name')
+        return Response(ShoppingListItemSerializer(items, many=True).data)
 
-        except Exception as e:
-            print(f"Error in download_shopping_cart: {str(e)}")
-            print(traceback.format_exc())
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=[IsAuthenticated]
+    )
+    def download_shopping_cart(self, request):
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {'errors': f'Неподдерживаемый формат: {file_format}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        rows = shopping_list_rows(request.user)
+        first_row = next(rows, None)
+        if first_row is None:
             return Response(
-                {"detail": "Ошибка при генерации файла."},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {"detail": "Список покупок пуст."},
+                status=status.HTTP_200_OK,
+                content_type='application/json'
             )
+        content_type, render = EXPORT_FORMATS[file_format]
+        response = StreamingHttpResponse(
+            render(itertools.chain([first_row], rows)),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_cart.{file_format}"'
+        )
+        return response
+
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= здесь выбирает формат файла, а не рендерер DRF.
+        if self.action == 'download_shopping_cart':
+            force = True
+        return super().perform_content_negotiation(request, force)
+
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(
+    ReplicaReadMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [AllowAny]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['name']
     pagination_class = None
+    conditional_actions = ('list', 'retrieve')
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        name = self.request.query_params.get('name')
+    def get_version(self, obj=None):
+        if self.action == 'list':
+            return (
+                *ingredient_index.version(),
+                self.request.query_params.get('name')
+            )
+        if obj is not None:
+            return obj.updated_at
+        if str(self.kwargs['pk']).isdigit():
+            return Ingredient.objects.filter(
+                pk=self.kwargs['pk']
+            ).values_list('updated_at', flat=True).first()
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(self.list_or_search, request, *args, **kwargs)
+
+    def list_or_search(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
         if name:
-            queryset = queryset.filter(name__istartswith=name)
-        return queryset
-
-
-def short_link_redirect(request, recipe_id):
-    try:
-        print(f"Redirecting recipe ID: {recipe_id}")
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-        print(f"Found recipe: {recipe.id}, {recipe.name}")
-        return redirect(f'/recipes/{recipe.id}/')
-    except Http404:
-        print(f"Recipe with ID {recipe_id} not found")
-        raise Http404("Recipe not found")
\ No newline at end of file
+            return Response(ingredient_index.search(name))
+        return Response(ingredient_index.all())
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+    @action(methods=['get'], detail=False)
+    def snapshot(self, request):
+        """
+        Весь каталог готовыми сжатыми байтами. По адресу с ?v=<версия>
+        из заголовка Content-Location ответ кешируется на год.
+        """
+        snapshot = ingredient_index.snapshot()
+        encoding = snapshot.negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        etag = quote_etag(
+            f'{snapshot.version}-{encoding}' if encoding else snapshot.version
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(
+                snapshot.bodies[encoding], content_type='application/json'
+            )
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Content-Location'] = (
+            f'{request.path}?v={snapshot.version}'
+        )
+        if request.query_params.get('v') == snapshot.version:
+            patch_cache_control(
+                response, public=True, max_age=365 * 24 * 60 * 60,
+                immutable=True
+            )
+        else:
+            patch_cache_control(
+                response, public=True,
+                max_age=settings.INGREDIENT_SNAPSHOT_MAX_AGE
+            )
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+def short_link_redirect(request, code):
+    recipe_id = short_links.resolve(code)
+    if recipe_id is None:
+        raise Http404('Рецепт не найден')
+    short_links.click_buffer.hit(recipe_id)
+    return redirect(f'/recipes/{recipe_id}/')
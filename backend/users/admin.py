@@ -4,7 +4,10 @@ from .models import CustomUser
 
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
-    list_display = ('username', 'email', 'first_name', 'last_name')
+    list_display = (
+        'username', 'email', 'first_name', 'last_name',
+        'recipes_count', 'followers_count'
+    )
     search_fields = ('email', 'username')
     list_filter = ('is_staff', 'is_active')
     empty_value_display = '-пусто-'
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""Async-версия подписки на автора для ASGI-режима."""
+from foodgram.async_api import (
+    aget_object_or_404, api_view, empty_response, json_response
+)
+from recipes import feed
+from recipes.counters import adelete_links
+from .models import CustomUser, Follow
+from .serializers import FollowSerializer
+
+
+async def unfollow(user, author):
+    removed = await adelete_links(
+        Follow.objects.filter(user=user, author=author),
+        'author', 'followers_count'
+    )
+    await feed.aunfollowed(user.id, removed)
+
+
+@api_view('POST', 'DELETE', authenticated=True)
+async def subscribe(request, pk):
+    author = await aget_object_or_404(CustomUser.objects.all(), pk=pk)
+    follows = Follow.objects.filter(user=request.user, author=author)
+    if request.method == 'DELETE':
+        if not await follows.aexists():
+            return json_response(
+                {'errors': 'Вы не подписаны на этого автора'}, 400
+            )
+        await unfollow(request.user, author)
+        return empty_response()
+    if request.user == author:
+        return json_response(
+            {'errors': 'Нельзя подписаться на самого себя'}, 400
+        )
+    if await follows.aexists():
+        return json_response(
+            {'errors': 'Вы уже подписаны на этого автора'}, 400
+        )
+    follow = await Follow.objects.acreate(user=request.user, author=author)
+    recipes = author.recipes.all()
+    try:
+        recipes = recipes[:int(request.GET.get('recipes_limit'))]
+    except (TypeError, ValueError):
+        pass
+    author.limited_recipes = [recipe async for recipe in recipes]
+    return json_response(
+        FollowSerializer(follow, context={'request': request}).data, 201
+    )
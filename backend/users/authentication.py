@@ -0,0 +1,90 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+INVALID_TOKEN = 'Недействительный токен.'
+INACTIVE_USER = 'Пользователь неактивен или удален.'
+
+
+def token_cache():
+    alias = settings.TOKEN_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def token_cache_key(key):
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_tokens(*keys):
+    cache = token_cache()
+    if cache is not None:
+        cache.delete_many([token_cache_key(key) for key in keys])
+
+
+def check_active(credentials):
+    if not credentials[0].is_active:
+        raise exceptions.AuthenticationFailed(INACTIVE_USER)
+    return credentials
+
+
+class TokenKeyParser(TokenAuthentication):
+    """Разбор заголовка Authorization без обращения к базе: вернет ключ."""
+
+    def authenticate_credentials(self, key):
+        return key
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication с кешем token -> (user, token).
+
+    Записи живут TOKEN_CACHE_TIMEOUT секунд и сбрасываются сигналами при
+    удалении токена (logout) и любом сохранении пользователя (смена пароля,
+    деактивация). Сброс должны увидеть все процессы, поэтому кеш работает
+    только в общем бэкенде: без него (TOKEN_CACHE_ALIAS = None) токен
+    проверяется по базе на каждый запрос.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = token_cache()
+        cache_key = token_cache_key(key)
+        cached = None if cache is None else cache.get(cache_key)
+        if cached is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(INVALID_TOKEN)
+            cached = check_active((token.user, token))
+            if cache is not None:
+                cache.set(cache_key, cached, settings.TOKEN_CACHE_TIMEOUT)
+        return check_active(cached)
+
+    async def aauthenticate(self, request):
+        """authenticate() для async-представлений Django."""
+        key = TokenKeyParser().authenticate(request)
+        if key is None:
+            return None
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        cache = token_cache()
+        cache_key = token_cache_key(key)
+        cached = None if cache is None else await cache.aget(cache_key)
+        if cached is None:
+            model = self.get_model()
+            try:
+                token = await model.objects.select_related('user').aget(
+                    key=key
+                )
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(INVALID_TOKEN)
+            cached = check_active((token.user, token))
+            if cache is not None:
+                await cache.aset(
+                    cache_key, cached, settings.TOKEN_CACHE_TIMEOUT
+                )
+        return check_active(cached)
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-18 06:13
+
+from django.db import migrations
+import foodgram.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='avatar',
+            field=foodgram.images.DerivativeImageField(blank=True, null=True, upload_to='users/avatars/', verbose_name='Аватар'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from foodgram.images import DerivativeImageField
 
 
 class CustomUser(AbstractUser):
@@ -22,12 +23,24 @@ class CustomUser(AbstractUser):
         max_length=150,
         verbose_name='Фамилия'
     )
-    avatar = models.ImageField(
+    avatar = DerivativeImageField(
         upload_to='users/avatars/',
         null=True,
         blank=True,
         verbose_name='Аватар'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -1,5 +1,6 @@
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
+from foodgram.images import ImageVariantsField
 from .models import CustomUser, Follow
 
 
@@ -52,6 +53,7 @@ class CustomUserCreateSerializer(UserCreateSerializer):
 
 
 class CustomUserSerializer(UserSerializer):
+    avatar_variants = ImageVariantsField(source='avatar')
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -63,10 +65,13 @@ class CustomUserSerializer(UserSerializer):
             'first_name',
             'last_name',
             'avatar',
+            'avatar_variants',
             'is_subscribed'
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return (
             request and request.user.is_authenticated and
@@ -81,6 +86,7 @@ class FollowSerializer(serializers.ModelSerializer):
     first_name = serializers.ReadOnlyField(source='author.first_name')
     last_name = serializers.ReadOnlyField(source='author.last_name')
     avatar = serializers.ImageField(source='author.avatar', read_only=True)
+    avatar_variants = ImageVariantsField(source='author.avatar')
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
@@ -94,6 +100,7 @@ class FollowSerializer(serializers.ModelSerializer):
             'first_name',
             'last_name',
             'avatar',
+            'avatar_variants',
             'is_subscribed',
             'recipes',
             'recipes_count'
@@ -105,6 +112,11 @@ class FollowSerializer(serializers.ModelSerializer):
     def get_recipes(self, obj):
         from recipes.serializers import RecipeMinifiedSerializer
         request = self.context.get('request')
+        if hasattr(obj.author, 'limited_recipes'):
+            return RecipeMinifiedSerializer(
+                obj.author.limited_recipes, many=True,
+                context={'request': request}
+            ).data
         recipes = obj.author.recipes.all()
         recipes_limit = request.query_params.get('recipes_limit')
         if recipes_limit:
@@ -115,4 +127,4 @@ class FollowSerializer(serializers.ModelSerializer):
         return RecipeMinifiedSerializer(recipes, many=True, context={'request': request}).data
 
     def get_recipes_count(self, obj):
-        return obj.author.recipes.count()
\ No newline at end of file
+        return obj.author.recipes_count
\ No newline at end of file
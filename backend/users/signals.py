@@ -0,0 +1,51 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes import feed
+from recipes.counters import increment
+from .authentication import invalidate_tokens
+from .models import CustomUser, Follow
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_tokens(instance.key)
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    invalidate_tokens(*Token.objects.filter(
+        user_id=instance.pk
+    ).values_list('key', flat=True))
+
+
+@receiver(post_save, sender=Follow)
+def count_follower_added(sender, instance, created, **kwargs):
+    if created:
+        increment(
+            CustomUser.objects.filter(pk=instance.author_id),
+            'followers_count', 1
+        )
+
+
+@receiver(pre_delete, sender=CustomUser)
+def count_followers_removed(sender, instance, **kwargs):
+    """Подписки удаляются каскадом без сигналов: один UPDATE на всех."""
+    increment(
+        CustomUser.objects.filter(
+            pk__in=Follow.objects.filter(user=instance).values('author_id')
+        ),
+        'followers_count', -1
+    )
+
+
+@receiver(post_save, sender=Follow)
+def add_to_timeline(sender, instance, created, **kwargs):
+    if created:
+        feed.followed(instance.user_id, [instance.author_id])
+
+
+@receiver(pre_delete, sender=CustomUser)
+def remove_timeline_entries(sender, instance, **kwargs):
+    feed.user_deleted(instance.pk)
@@ -1,3 +1,220 @@
-from django.test import TestCase
+from django.core.files.storage import default_storage
+from django.test import override_settings
 
-# Create your tests here.
+from foodgram.images import derivative_name
+from recipes.models import Recipe
+from users.models import CustomUser, Follow
+from recipes.tests import QueryBudgetTestCase, make_base64_image
+
+
+class UserQueryBudgetTest(QueryBudgetTestCase):
+
+    def test_user_list(self):
+        self.assertPageBudget(3, self.auth_client, '/api/users/')
+
+    def test_user_list_anonymous(self):
+        self.assertPageBudget(2, self.anon_client, '/api/users/')
+
+    def test_user_me(self):
+        self.assertQueryBudget(2, self.auth_client, '/api/users/me/')
+
+    def test_subscriptions(self):
+        self.assertPageBudget(
+            4, self.auth_client, '/api/users/subscriptions/'
+        )
+
+    def test_subscriptions_recipes_limit(self):
+        self.assertPageBudget(
+            4, self.auth_client,
+            '/api/users/subscriptions/?recipes_limit=2'
+        )
+
+    def test_subscriptions_recipes_limit_per_author(self):
+        response, context = self.get_counted(
+            self.auth_client, '/api/users/subscriptions/?recipes_limit=2'
+        )
+        self.assertTrue(any(
+            'ROW_NUMBER() OVER' in query['sql']
+            for query in context.captured_queries
+        ))
+        for author in response.json()['results']:
+            self.assertEqual(author['recipes_count'], self.RECIPES_PER_USER)
+            self.assertEqual(len(author['recipes']), 2)
+            expected = list(Recipe.objects.filter(
+                author_id=author['id']
+            ).values_list('id', flat=True)[:2])
+            self.assertEqual(
+                [recipe['id'] for recipe in author['recipes']], expected
+            )
+
+    def test_subscriptions_cursor(self):
+        response = self.auth_client.get(
+            '/api/users/subscriptions/?pagination=cursor&limit=3'
+        )
+        self.assertNotIn('count', response.json())
+        ids = [item['id'] for item in response.json()['results']]
+        response = self.auth_client.get(response.json()['next'])
+        ids += [item['id'] for item in response.json()['results']]
+        self.assertEqual(ids, [user.id for user in self.users[1:7]])
+
+
+class AvatarDerivativeTest(QueryBudgetTestCase):
+
+    def test_avatar_derivatives_created_and_deleted(self):
+        response = self.auth_client.put(
+            '/api/users/me/avatar/',
+            {'avatar': make_base64_image((500, 500))},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.user.refresh_from_db()
+        names = [
+            derivative_name(self.user.avatar.name, kind)
+            for kind in ('thumbnail', 'thumbnail_webp', 'webp')
+        ]
+        self.assertTrue(all(default_storage.exists(name) for name in names))
+        variants = self.auth_client.get('/api/users/me/').json()[
+            'avatar_variants'
+        ]
+        self.assertTrue(variants['thumbnail_webp'].endswith(names[1]))
+        response = self.auth_client.delete('/api/users/me/avatar/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+        self.assertIsNone(
+            self.auth_client.get('/api/users/me/').json()['avatar_variants']
+        )
+
+
+@override_settings(TOKEN_CACHE_ALIAS='default')
+class CachedTokenAuthenticationTest(QueryBudgetTestCase):
+
+    def token_queries(self, path='/api/users/me/'):
+        response, context = self.get_counted(self.auth_client, path)
+        return sum(
+            'authtoken_token' in query['sql']
+            for query in context.captured_queries
+        )
+
+    def test_token_lookup_is_cached(self):
+        self.assertEqual(self.token_queries(), 1)
+        self.assertEqual(self.token_queries(), 0)
+        self.assertEqual(self.token_queries('/api/recipes/'), 0)
+
+    def test_logout_invalidates_cache(self):
+        self.token_queries()
+        response = self.auth_client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            self.auth_client.get('/api/users/me/').status_code, 401
+        )
+
+    def test_password_change_invalidates_cache(self):
+        self.token_queries()
+        response = self.auth_client.post('/api/users/set_password/', {
+            'current_password': 'password12345',
+            'new_password': 'another-password-1',
+        })
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.token_queries(), 1)
+
+    def test_deactivation_invalidates_cache(self):
+        self.token_queries()
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+        self.assertEqual(
+            self.auth_client.get('/api/users/me/').status_code, 401
+        )
+
+    @override_settings(TOKEN_CACHE_ALIAS=None)
+    def test_no_cache_without_shared_backend(self):
+        self.assertEqual(self.token_queries(), 1)
+        self.assertEqual(self.token_queries(), 1)
+        self.auth_client.post('/api/auth/token/logout/')
+        self.assertEqual(
+            self.auth_client.get('/api/users/me/').status_code, 401
+        )
+
+    def test_errors_are_in_russian(self):
+        self.auth_client.credentials(HTTP_AUTHORIZATION='Token wrong')
+        self.assertEqual(
+            self.auth_client.get('/api/users/me/').json(),
+            {'detail': 'Недействительный токен.'}
+        )
+        CustomUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.auth_client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+        self.assertEqual(
+            self.auth_client.get('/api/users/me/').json(),
+            {'detail': 'Пользователь неактивен или удален.'}
+        )
+
+
+class SubscribeBatchTest(QueryBudgetTestCase):
+
+    def subscribe(self, ids, method='post'):
+        response = getattr(self.auth_client, method)(
+            '/api/users/subscribe/', {'ids': ids}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return {
+            item['id']: item['status'] for item in response.json()['results']
+        }
+
+    def test_subscribe_batch(self):
+        stranger = CustomUser.objects.create_user(
+            username='stranger', email='stranger@example.com',
+            password='password12345'
+        )
+        followed = self.users[1].id
+        self.assertEqual(
+            self.subscribe([stranger.id, followed, self.user.id, 10 ** 6]),
+            {stranger.id: 201, followed: 400, self.user.id: 400, 10 ** 6: 404}
+        )
+        self.assertTrue(
+            Follow.objects.filter(user=self.user, author=stranger).exists()
+        )
+        self.assertCounters()
+        self.assertEqual(
+            self.subscribe([stranger.id, followed, self.user.id], 'delete'),
+            {stranger.id: 204, followed: 204, self.user.id: 400}
+        )
+        self.assertFalse(Follow.objects.filter(
+            user=self.user, author_id__in=[stranger.id, followed]
+        ).exists())
+        self.assertCounters()
+
+
+@override_settings(TOKEN_CACHE_ALIAS='default')
+class ConditionalUserTest(QueryBudgetTestCase):
+
+    def test_me_and_detail(self):
+        self.auth_client.get('/api/users/me/')
+        response = self.auth_client.get('/api/users/me/')
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            again = self.auth_client.get(
+                '/api/users/me/', HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(again.status_code, 304)
+        self.auth_client.put(
+            '/api/users/me/avatar/', {'avatar': make_base64_image()},
+            format='json'
+        )
+        response = self.auth_client.get(
+            '/api/users/me/', HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+        path = f'/api/users/{self.users[1].id}/'
+        response = self.auth_client.get(path)
+        self.assertEqual(self.auth_client.get(
+            path, HTTP_IF_NONE_MATCH=response['ETag']
+        ).status_code, 304)
+        self.auth_client.delete(f'/api/users/{self.users[1].id}/subscribe/')
+        response = self.auth_client.get(
+            path, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['is_subscribed'])
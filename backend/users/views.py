@@ -3,17 +3,78 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Value
 from django.contrib.auth import update_session_auth_hash
 from .models import CustomUser, Follow
+from recipes import batch, feed
+from recipes.counters import delete_links, increment
+from recipes.models import Recipe
 from .serializers import CustomUserSerializer, CustomUserCreateSerializer, FollowSerializer, SetPasswordSerializer
 from .fields import Base64ImageField
-from rest_framework.pagination import LimitOffsetPagination
+from foodgram.conditional import ConditionalGetMixin
+from foodgram.db_routers import ReplicaReadMixin
+from foodgram.pagination import LimitOffsetOrCursorPagination
 from rest_framework import serializers
 
 
-class CustomUserViewSet(viewsets.ModelViewSet):
+class CustomUserViewSet(
+    ReplicaReadMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
+    conditional_actions = ('retrieve', 'me')
+
+    def get_version(self, obj=None):
+        user = self.request.user
+        if self.action == 'me':
+            return user.id, user.updated_at
+        if obj is not None:
+            return (
+                obj.id, obj.updated_at, getattr(obj, 'is_subscribed', False)
+            )
+        if str(self.kwargs['pk']).isdigit():
+            queryset = CustomUser.objects.filter(pk=self.kwargs['pk'])
+            if user.is_authenticated:
+                queryset = queryset.annotate(is_subscribed=Exists(
+                    Follow.objects.filter(user=user, author=OuterRef('pk'))
+                ))
+            else:
+                queryset = queryset.annotate(is_subscribed=Value(False))
+            return queryset.values_list(
+                'id', 'updated_at', 'is_subscribed'
+            ).order_by().first()
+        return None
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_subscribed=Exists(
+                    Follow.objects.filter(user=user, author=OuterRef('pk'))
+                )
+            )
+        return queryset
+
+    def get_follows(self, request):
+        # Срез внутри Prefetch Django выполняет одним запросом с
+        # ROW_NUMBER() OVER (PARTITION BY author_id), так что на страницу
+        # подписок уходит фиксированное число запросов.
+        recipes = Recipe.objects.all()
+        recipes_limit = request.query_params.get('recipes_limit')
+        if recipes_limit and recipes_limit.isdigit():
+            recipes = recipes[:int(recipes_limit)]
+        return Follow.objects.filter(user=request.user).select_related(
+            'author'
+        ).prefetch_related(
+            Prefetch(
+                'author__recipes', queryset=recipes, to_attr='limited_recipes'
+            )
+        )
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve', 'create']:
@@ -60,8 +121,7 @@ class CustomUserViewSet(viewsets.ModelViewSet):
     )
     def me(self, request):
         if request.method == 'GET':
-            serializer = self.get_serializer(request.user)
-            return Response(serializer.data)
+            return self.conditional(self.current_user, request)
         elif request.method == 'POST':
             serializer = self.get_serializer(
                 request.user, data=request.data, partial=True
@@ -71,6 +131,9 @@ class CustomUserViewSet(viewsets.ModelViewSet):
             return Response(serializer.data)
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
+    def current_user(self, request):
+        return Response(self.get_serializer(request.user).data)
+
     @action(
         methods=['post', 'delete'],
         detail=True,
@@ -103,18 +166,81 @@ class CustomUserViewSet(viewsets.ModelViewSet):
                 {'errors': 'Вы не подписаны на этого автора'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        Follow.objects.filter(user=request.user, author=author).delete()
+        with transaction.atomic():
+            delete_links(
+                Follow.objects.filter(user=request.user, author=author),
+                'author', 'followers_count'
+            )
+            feed.unfollowed(request.user.id, [author.id])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        methods=['post', 'delete'],
+        detail=False,
+        url_path='subscribe',
+        url_name='subscribe-batch',
+        permission_classes=[IsAuthenticated]
+    )
+    def subscribe_batch(self, request):
+        serializer = batch.BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        user = request.user
+        with transaction.atomic():
+            if request.method == 'POST':
+                found = set(CustomUser.objects.select_for_update().filter(
+                    id__in=ids
+                ).exclude(id=user.id).order_by('id').values_list(
+                    'id', flat=True
+                ))
+                changed = batch.link(
+                    user, Follow, 'author', [pk for pk in ids if pk in found]
+                )
+                increment(
+                    CustomUser.objects.filter(id__in=changed),
+                    'followers_count', 1
+                )
+                feed.followed(user.id, changed)
+                sign, code = 1, status.HTTP_201_CREATED
+                error = 'Вы уже подписаны на этого автора'
+            else:
+                found = set(ids)
+                changed = batch.unlink(
+                    user, Follow, 'author', 'followers_count', ids
+                )
+                feed.unfollowed(user.id, changed)
+                sign, code = -1, status.HTTP_204_NO_CONTENT
+                error = 'Вы не подписаны на этого автора'
+
+        results = []
+        for pk in ids:
+            if pk in changed:
+                results.append(batch.result(pk, code))
+            elif pk == user.id and sign > 0:
+                results.append(batch.result(
+                    pk, status.HTTP_400_BAD_REQUEST,
+                    'Нельзя подписаться на самого себя'
+                ))
+            elif pk not in found:
+                results.append(batch.result(
+                    pk, status.HTTP_404_NOT_FOUND, 'Пользователь не найден'
+                ))
+            else:
+                results.append(batch.result(
+                    pk, status.HTTP_400_BAD_REQUEST, error
+                ))
+        return Response({'results': results})
+
     @action(
         methods=['get'],
         detail=False,
         permission_classes=[IsAuthenticated]
     )
     def subscriptions(self, request):
-        follows = Follow.objects.filter(user=request.user)
-        paginator = LimitOffsetPagination()
+        follows = self.get_follows(request).order_by('id')
+        paginator = LimitOffsetOrCursorPagination()
         paginator.default_limit = 6
+        paginator.cursor_ordering = ('id',)
         result_page = paginator.paginate_queryset(follows, request)
         serializer = FollowSerializer(
             result_page, many=True, context={'request': request}